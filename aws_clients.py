@@ -0,0 +1,71 @@
+# aws_clients.py
+
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+# Pool size and retry behaviour, overridable per deployment through the environment
+AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", 50))
+AWS_RETRY_MODE = os.environ.get("AWS_RETRY_MODE", "adaptive")
+AWS_MAX_ATTEMPTS = int(os.environ.get("AWS_MAX_ATTEMPTS", 8))
+AWS_CONNECT_TIMEOUT = float(os.environ.get("AWS_CONNECT_TIMEOUT", 10))
+AWS_READ_TIMEOUT = float(os.environ.get("AWS_READ_TIMEOUT", 60))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_config(max_pool_connections=None, retry_mode=None, max_attempts=None):
+    return Config(
+        max_pool_connections=max_pool_connections or AWS_MAX_POOL_CONNECTIONS,
+        retries={"mode": retry_mode or AWS_RETRY_MODE, "max_attempts": max_attempts or AWS_MAX_ATTEMPTS},
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        tcp_keepalive=True,
+    )
+
+
+# Build each client once per process and hand the same instance to every caller.
+# boto3 clients are thread-safe, so sessions and batch workers share their connection pool.
+# Credentials default to boto3's normal lookup chain; pass explicit keys to pin them.
+def get_client(service_name, region_name=None, aws_access_key_id=None, aws_secret_access_key=None, config=None):
+    region_name = region_name or AWS_REGION
+    cache_key = (service_name, region_name, aws_access_key_id)
+
+    client = _clients.get(cache_key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            session = boto3.session.Session(
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+            )
+            client = session.client(service_name, region_name=region_name, config=config or client_config())
+            _clients[cache_key] = client
+        return client
+
+
+def get_s3_client(**kwargs):
+    return get_client('s3', **kwargs)
+
+
+# Textract throttling and transient errors are retried by rate_limiter, which also adapts the
+# shared call rate; botocore retrying them as well would hide throttling from the limiter
+TEXTRACT_CLIENT_CONFIG = client_config(retry_mode="standard", max_attempts=1)
+
+
+def get_textract_client(**kwargs):
+    kwargs.setdefault('config', TEXTRACT_CLIENT_CONFIG)
+    return get_client('textract', **kwargs)
+
+
+# Drop cached clients, e.g. after rotating credentials
+def reset_clients():
+    with _clients_lock:
+        _clients.clear()
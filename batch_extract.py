@@ -0,0 +1,329 @@
+# batch_extract.py
+#
+# Headless batch extraction over s3_filenames.txt:
+#   python batch_extract.py --keys s3_filenames.txt --workers 8 --output batch_results.jsonl --csv batch_results.csv
+#
+# Finished keys are read back from the JSONL output on start, so re-running the same
+# command after a crash resumes where the previous run stopped. Failed documents, and partial
+# ones where a Textract call failed, go to the .errors file instead and are retried on resume.
+#
+# Across machines, each node takes a stable slice of the key list and writes its own partition
+# (batch_results.shard-0-of-3.jsonl, ...); the merge step checks that every key was done once:
+#   python batch_extract.py --shard 0/3        # on node 0, likewise 1/3 and 2/3
+#   python batch_extract.py --merge            # after copying the partitions to one place
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from aws_clients import get_s3_client, get_textract_client
+from log_setup import configure_logging
+from extraction import CALLS_PER_DOCUMENT, SECOND_CALL_MODES
+from pipeline import process_document
+from textract_cache import get_default_cache
+from textract_calls import reserve_call_workers, release_call_workers
+from metrics import export_if_configured
+
+logger = logging.getLogger("TextractLogger")
+
+CSV_FIELDS = ["key", "BOL #", "Card In time", "Card Out time", "latency_seconds"]
+
+
+# Read the key list, skipping blank lines and duplicates while keeping file order
+def read_keys(file_path):
+    seen = set()
+    keys = []
+    with open(file_path, 'r') as file:
+        for line in file:
+            key = line.strip()
+            if key and key not in seen:
+                seen.add(key)
+                keys.append(key)
+    return keys
+
+
+# Keys already written to the JSONL output; a torn last line from a crash is ignored
+def load_checkpoint(output_path):
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r') as file:
+        for line in file:
+            try:
+                done.add(json.loads(line)["key"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# Stable across processes and machines, unlike hash(); depends only on the key
+def shard_of(key, shard_count):
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") % shard_count
+
+
+# "i/N" with 0 <= i < N
+def parse_shard(value):
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", value or "")
+    if not match or not 0 <= int(match.group(1)) < int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"expected i/N with 0 <= i < N, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def select_shard(keys, shard_index, shard_count):
+    return [key for key in keys if shard_of(key, shard_count) == shard_index]
+
+
+# batch_results.jsonl -> batch_results.shard-0-of-3.jsonl
+def partition_path(output_path, shard_index, shard_count):
+    stem, extension = os.path.splitext(output_path)
+    return f"{stem}.shard-{shard_index}-of-{shard_count}{extension}"
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+# Combine shard partitions into output_path and check them against the key list: every key
+# must be processed exactly once, by the shard it hashes to. Records are streamed, so memory
+# stays bounded by the key list rather than the results.
+def merge_partitions(keys, output_path, partition_paths=None):
+    pattern = re.compile(r"\.shard-(\d+)-of-(\d+)\.[^.]+$")
+    stem, extension = os.path.splitext(output_path)
+    if partition_paths is None:
+        partition_paths = sorted(glob.glob(f"{glob.escape(stem)}.shard-*-of-*{extension}"))
+    if not partition_paths:
+        raise FileNotFoundError(f"no partitions matching {stem}.shard-*-of-*{extension}")
+
+    shard_counts, present = set(), set()
+    expected = set(keys)
+    done, duplicates, misrouted, unexpected, failed = set(), [], [], [], set()
+    with open(output_path, 'w') as merged:
+        for path in partition_paths:
+            match = pattern.search(path)
+            shard_index, shard_count = (int(match.group(1)), int(match.group(2))) if match else (None, None)
+            if match:
+                shard_counts.add(shard_count)
+                present.add(shard_index)
+            for record in _read_jsonl(path):
+                key = record.get("key")
+                if key in done:
+                    duplicates.append(key)
+                    continue
+                if key not in expected:
+                    unexpected.append(key)
+                if shard_count and shard_of(key, shard_count) != shard_index:
+                    misrouted.append(key)
+                done.add(key)
+                merged.write(json.dumps(record) + "\n")
+            failed.update(record.get("key") for record in _read_jsonl(f"{path}.errors"))
+
+    shard_count = max(shard_counts, default=0)
+    missing = [key for key in keys if key not in done]
+    return {
+        "partitions": len(partition_paths),
+        "missing_partitions": sorted(set(range(shard_count)) - present),
+        "mixed_shard_counts": len(shard_counts) > 1,
+        "merged": len(done),
+        "missing": len(missing),
+        "failed": len([key for key in missing if key in failed]),
+        "duplicates": len(duplicates),
+        "misrouted": len(misrouted),
+        "unexpected": len(unexpected),
+        "missing_keys": missing[:20],
+        "duplicate_keys": duplicates[:20],
+    }
+
+
+# Same extraction and post-processing as the Streamlit app, without the UI
+def process_key(s3, textract, bucket, key, cache=None, use_store=True, second_call=None):
+    start = time.perf_counter()
+    final_result, processed_result, payload = process_document(
+        bucket, key, s3=s3, textract=textract, cache=cache, use_cache=cache is not None, use_store=use_store,
+        second_call=second_call,
+    )
+    return final_result, processed_result, payload, time.perf_counter() - start
+
+
+# Appends results as they finish; results are flushed per record so the JSONL doubles as the checkpoint
+class ResultWriter:
+    def __init__(self, output_path, csv_path=None, errors_path=None):
+        self._lock = threading.Lock()
+        self._jsonl = open(output_path, 'a')
+        self._errors = open(errors_path or f"{output_path}.errors", 'a')
+        self._csv_file = None
+        self._csv = None
+        if csv_path:
+            new_file = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+            self._csv_file = open(csv_path, 'a', newline='')
+            self._csv = csv.DictWriter(self._csv_file, fieldnames=CSV_FIELDS)
+            if new_file:
+                self._csv.writeheader()
+
+    def write_result(self, key, final_result, processed_result, latency, payload=None):
+        record = {"key": key, "latency_seconds": round(latency, 4), "processed": processed_result, "final": final_result, "payload": payload or {}}
+        with self._lock:
+            self._jsonl.write(json.dumps(record) + "\n")
+            self._jsonl.flush()
+            if self._csv:
+                self._csv.writerow({"key": key, "latency_seconds": round(latency, 4), **processed_result})
+                self._csv_file.flush()
+
+    def write_error(self, key, error, processed_result=None):
+        record = {"key": key, "error": str(error), "at": time.time()}
+        if processed_result is not None:
+            record["partial"] = True
+            record["processed"] = processed_result
+        with self._lock:
+            self._errors.write(json.dumps(record) + "\n")
+            self._errors.flush()
+
+    def close(self):
+        self._jsonl.close()
+        self._errors.close()
+        if self._csv_file:
+            self._csv_file.close()
+
+
+# Fan the keys out over a bounded pool, keeping at most 2 * workers documents in flight
+def run_batch(keys, bucket, output_path, csv_path=None, workers=8, use_cache=True, s3=None, textract=None, use_store=True, second_call=None):
+    s3 = s3 or get_s3_client()
+    textract = textract or get_textract_client()
+    cache = get_default_cache() if use_cache else None
+
+    done = load_checkpoint(output_path)
+    pending = [key for key in keys if key not in done]
+    # Every document in flight needs its own Textract call threads, or --workers stops scaling
+    call_workers = workers * CALLS_PER_DOCUMENT
+    reserve_call_workers(call_workers)
+    logger.info(f"Batch: {len(keys)} keys, {len(done)} already done, {len(pending)} to process")
+
+    writer = ResultWriter(output_path, csv_path)
+    latencies, failures, partials, bytes_saved, second_calls_avoided = [], 0, 0, 0, 0
+    start = time.perf_counter()
+    remaining = iter(pending)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+            in_flight = {}
+
+            def submit_next():
+                key = next(remaining, None)
+                if key is not None:
+                    in_flight[pool.submit(process_key, s3, textract, bucket, key, cache, use_store, second_call)] = key
+                return key is not None
+
+            while len(in_flight) < workers * 2 and submit_next():
+                pass
+
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = in_flight.pop(future)
+                    try:
+                        final_result, processed_result, payload, latency = future.result()
+                        # A result missing one of its Textract calls is not checkpointed, so a resume retries it
+                        if final_result.get('errors'):
+                            partials += 1
+                            logger.error(f"Batch: {key} incomplete: {final_result['errors']}")
+                            writer.write_error(key, "; ".join(f"{name}: {error}" for name, error in final_result['errors'].items()), processed_result)
+                        else:
+                            writer.write_result(key, final_result, processed_result, latency, payload)
+                            latencies.append(latency)
+                            bytes_saved += payload.get("bytes_saved", 0)
+                            second_calls_avoided += bool(payload.get("second_call_avoided"))
+                    except Exception as e:
+                        failures += 1
+                        logger.error(f"Batch: {key} failed: {e}")
+                        writer.write_error(key, e)
+                    submit_next()
+    finally:
+        writer.close()
+        release_call_workers(call_workers)
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "processed": len(latencies),
+        "failed": failures,
+        "partial": partials,
+        "skipped": len(done),
+        "elapsed_seconds": round(elapsed, 2),
+        "docs_per_second": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "p50_seconds": round(percentile(latencies, 0.50), 3),
+        "p95_seconds": round(percentile(latencies, 0.95), 3),
+        "bytes_saved": bytes_saved,
+        "second_calls_avoided": second_calls_avoided,
+    }
+    logger.info(f"Batch finished: {json.dumps(report)}")
+    export_if_configured(force=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch Textract extraction over a list of S3 keys")
+    parser.add_argument("--keys", default="s3_filenames.txt", help="file with one S3 key per line")
+    parser.add_argument("--bucket", default="fp-prod-s3")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL output, also used as the resume checkpoint")
+    parser.add_argument("--csv", default=None, help="optional CSV with the post-processed fields")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=None, help="only process the first N keys")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the local Textract response cache")
+    parser.add_argument("--second-call", choices=SECOND_CALL_MODES, default=None,
+                        help="eager, lazy or lazy_detect (default: TEXTRACT_SECOND_CALL or eager)")
+    parser.add_argument("--no-store", action="store_true", help="do not write results to the local results store")
+    parser.add_argument("--shard", type=parse_shard, default=None, help="process only slice i of N (0-based), e.g. 2/8")
+    parser.add_argument("--merge", action="store_true", help="merge the shard partitions of --output and check coverage")
+    args = parser.parse_args(argv)
+
+    configure_logging(console=True)
+
+    keys = read_keys(args.keys)
+    if args.limit is not None:
+        keys = keys[:args.limit]
+
+    if args.merge:
+        report = merge_partitions(keys, args.output)
+        print(json.dumps(report, indent=4))
+        complete = not (report["missing"] or report["duplicates"] or report["misrouted"] or report["missing_partitions"] or report["mixed_shard_counts"])
+        return 0 if complete else 1
+
+    output_path, csv_path = args.output, args.csv
+    if args.shard:
+        shard_index, shard_count = args.shard
+        keys = select_shard(keys, shard_index, shard_count)
+        output_path = partition_path(args.output, shard_index, shard_count)
+        csv_path = csv_path and partition_path(csv_path, shard_index, shard_count)
+        logger.info(f"Shard {shard_index}/{shard_count}: {len(keys)} keys -> {output_path}")
+
+    report = run_batch(keys, args.bucket, output_path, csv_path=csv_path, workers=args.workers, use_cache=not args.no_cache, use_store=not args.no_store, second_call=args.second_call)
+    if args.shard:
+        report["shard"] = f"{args.shard[0]}/{args.shard[1]}"
+    print(json.dumps(report, indent=4))
+    return 0 if report["failed"] == 0 and report["partial"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# benchmark.py
+#
+# Offline benchmarks over recorded (or synthetic) Textract fixtures; no network access needed:
+#   python textract_replay.py synthetic --count 200 --fixtures fixtures
+#   python benchmark.py --fixtures fixtures --concurrency 1,4,16 --latency 0.25 --output benchmark_results.json
+#   python benchmark.py --fixtures fixtures --baseline benchmark_results.json   # flags regressions
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from batch_extract import run_batch, percentile
+from postprocessing import clean_summary_data, clean_products_data, process_bol_data, process_load_start_time, process_card_out_time
+from rate_limiter import limiter_stats, reset_limiters
+from textract_replay import ReplayS3Client, ReplayTextractClient
+from try2 import extract_summary_fields, extract_line_items
+
+logger = logging.getLogger("TextractLogger")
+
+# A benchmark is reported as a regression when it gets slower than the baseline by more than this
+REGRESSION_THRESHOLD = 0.20
+# Limiter rate used when no quota is simulated, high enough never to be the bottleneck
+UNLIMITED_TPS = 1e6
+
+
+def _load_responses(fixtures_dir, api_name):
+    directory = os.path.join(fixtures_dir, "responses", api_name)
+    responses = []
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        with open(os.path.join(directory, name), 'r') as file:
+            responses.append(json.load(file))
+    return responses
+
+
+# Run fn over every item, repeated, and report per-call latency
+def _measure(fn, items, repeat):
+    timings = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            fn(item)
+            timings.append(time.perf_counter() - start)
+    total = sum(timings)
+    return {
+        "calls": len(timings),
+        "total_seconds": round(total, 6),
+        "mean_us": round(1e6 * total / len(timings), 3) if timings else 0.0,
+        "p50_us": round(1e6 * percentile(timings, 0.50), 3),
+        "p95_us": round(1e6 * percentile(timings, 0.95), 3),
+    }
+
+
+def bench_functions(fixtures_dir, repeat=20):
+    quiet = logging.getLogger("benchmark.quiet")
+    quiet.disabled = True
+
+    expenses = _load_responses(fixtures_dir, 'analyze_expense')
+    if not expenses:
+        raise SystemExit(f"No analyze_expense fixtures under {fixtures_dir}")
+
+    final_results = [
+        {
+            'summary': clean_summary_data(extract_summary_fields(response, quiet)),
+            'products': clean_products_data(extract_line_items(response, quiet)),
+        }
+        for response in expenses
+    ]
+
+    return {
+        "extract_summary_fields": _measure(lambda response: extract_summary_fields(response, quiet), expenses, repeat),
+        "extract_line_items": _measure(lambda response: extract_line_items(response, quiet), expenses, repeat),
+        "process_bol_data": _measure(process_bol_data, final_results, repeat),
+        "process_load_start_time": _measure(process_load_start_time, final_results, repeat),
+        "process_card_out_time": _measure(process_card_out_time, final_results, repeat),
+    }
+
+
+# End-to-end batch throughput against the replay clients at several worker counts. The shared
+# rate limiters are reset for every run: to the simulated quota, or out of the way without one,
+# so the configured account quotas do not cap the measurement.
+def bench_throughput(fixtures_dir, concurrency_levels, latency, jitter, throttle_rate, limit=None, quota_tps=None):
+    s3 = ReplayS3Client(fixtures_dir)
+    keys = s3.keys()[:limit] if limit else s3.keys()
+    results = {}
+
+    for workers in concurrency_levels:
+        textract = ReplayTextractClient(fixtures_dir, latency=latency, jitter=jitter, throttle_rate=throttle_rate, seed=workers, quota_tps=quota_tps)
+        reset_limiters(quota_tps or UNLIMITED_TPS)
+        with tempfile.TemporaryDirectory() as output_dir:
+            report = run_batch(keys, "replay", os.path.join(output_dir, "results.jsonl"), workers=workers, use_cache=False, s3=s3, textract=textract, use_store=False)
+        report["throttled_calls"] = textract.throttled
+        report["rate_limiter"] = limiter_stats()
+        results[f"workers_{workers}"] = report
+
+    reset_limiters()
+    return results
+
+
+# Compare timings against an earlier results file; lower is better for every compared value
+def find_regressions(current, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for name, stats in current.get("functions", {}).items():
+        before = baseline.get("functions", {}).get(name, {}).get("mean_us")
+        if before and stats["mean_us"] > before * (1 + threshold):
+            regressions.append(f"{name}: mean {before}us -> {stats['mean_us']}us")
+    for name, stats in current.get("throughput", {}).items():
+        before = baseline.get("throughput", {}).get(name, {}).get("docs_per_second")
+        if before and stats["docs_per_second"] < before * (1 - threshold):
+            regressions.append(f"{name}: {before} -> {stats['docs_per_second']} docs/sec")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite over Textract fixtures")
+    parser.add_argument("--fixtures", default="fixtures")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the fixtures for function benchmarks")
+    parser.add_argument("--concurrency", default="1,4,8,16", help="comma-separated worker counts for the throughput run")
+    parser.add_argument("--latency", type=float, default=0.25, help="simulated Textract round trip in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of calls failing with ThrottlingException")
+    parser.add_argument("--quota-tps", type=float, default=None, help="simulated per-API Textract TPS quota")
+    parser.add_argument("--limit", type=int, default=None, help="documents per throughput run")
+    parser.add_argument("--skip-throughput", action="store_true")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    logger.disabled = True
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {
+            "latency": args.latency, "jitter": args.jitter, "throttle_rate": args.throttle_rate, "quota_tps": args.quota_tps,
+            "rate_limit_tps": args.quota_tps or "unlimited",
+        },
+        "functions": bench_functions(args.fixtures, args.repeat),
+    }
+    if not args.skip_throughput:
+        levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+        results["throughput"] = bench_throughput(args.fixtures, levels, args.latency, args.jitter, args.throttle_rate, args.limit, args.quota_tps)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = find_regressions(results, json.load(file))
+        results["regressions"] = regressions
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=4)
+
+    print(json.dumps(results, indent=4))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
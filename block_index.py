@@ -0,0 +1,108 @@
+# block_index.py
+
+# One-pass index over an analyze_document / detect_document_text response.
+# Builds an id -> block map, then resolves the KEY_VALUE_SET and TABLE/CELL relationships into:
+#   lines       LINE texts in reading order
+#   key_values  {key text: value text} from FORMS, first occurrence wins
+#   tables      list of tables, each a list of rows of cell texts
+
+
+def _child_ids(block, relationship_type='CHILD'):
+    for relationship in block.get('Relationships', []):
+        if relationship['Type'] == relationship_type:
+            yield from relationship['Ids']
+
+
+def _text_of(block, blocks_by_id):
+    words = []
+    for child_id in _child_ids(block):
+        child = blocks_by_id.get(child_id)
+        if child is None:
+            continue
+        if child['BlockType'] == 'WORD':
+            words.append(child['Text'])
+        elif child['BlockType'] == 'SELECTION_ELEMENT' and child.get('SelectionStatus') == 'SELECTED':
+            words.append('X')
+    return ' '.join(words)
+
+
+def index_blocks(response):
+    blocks = response.get('Blocks', [])
+    blocks_by_id = {}
+    lines, keys, tables = [], [], []
+
+    for block in blocks:
+        blocks_by_id[block['Id']] = block
+        block_type = block['BlockType']
+        if block_type == 'LINE':
+            lines.append(block['Text'])
+        elif block_type == 'KEY_VALUE_SET' and 'KEY' in block.get('EntityTypes', []):
+            keys.append(block)
+        elif block_type == 'TABLE':
+            tables.append(block)
+
+    key_values = {}
+    for key_block in keys:
+        key_text = _text_of(key_block, blocks_by_id).strip()
+        if not key_text or key_text in key_values:
+            continue
+        value_text = ' '.join(
+            _text_of(blocks_by_id[value_id], blocks_by_id)
+            for value_id in _child_ids(key_block, 'VALUE')
+            if value_id in blocks_by_id
+        ).strip()
+        key_values[key_text] = value_text
+
+    table_rows = []
+    for table_block in tables:
+        cells = {}
+        for cell_id in _child_ids(table_block):
+            cell = blocks_by_id.get(cell_id)
+            if cell is not None and cell['BlockType'] == 'CELL':
+                cells[(cell['RowIndex'], cell['ColumnIndex'])] = _text_of(cell, blocks_by_id)
+        if not cells:
+            continue
+        row_count = max(row for row, _ in cells)
+        column_count = max(column for _, column in cells)
+        table_rows.append([
+            [cells.get((row, column), '') for column in range(1, column_count + 1)]
+            for row in range(1, row_count + 1)
+        ])
+
+    return {'lines': lines, 'key_values': key_values, 'tables': table_rows}
+
+
+# Merge per-page indexes in page order
+def merge_indexes(indexes):
+    merged = {'lines': [], 'key_values': {}, 'tables': []}
+    for index in indexes:
+        merged['lines'].extend(index['lines'])
+        for key, value in index['key_values'].items():
+            merged['key_values'].setdefault(key, value)
+        merged['tables'].extend(index['tables'])
+    return merged
+
+
+# Turn tables into product-style dicts, using each table's first row as the header
+def table_records(tables):
+    records = []
+    for table in tables:
+        if len(table) < 2:
+            continue
+        header = [name.strip() or f"column {position + 1}" for position, name in enumerate(table[0])]
+        for row in table[1:]:
+            record = {name: value for name, value in zip(header, row) if value}
+            if record:
+                records.append(record)
+    return records
+
+
+# detect_document_text has no FORMS; treat "Key: value" lines as key/value pairs, first occurrence wins
+def line_key_values(lines):
+    key_values = {}
+    for line in lines:
+        key, separator, value = line.partition(':')
+        key, value = key.strip(), value.strip()
+        if separator and key and value and key not in key_values:
+            key_values[key] = value
+    return key_values
@@ -0,0 +1,127 @@
+# bulk_postprocessing.py
+#
+# Columnar version of postprocessing.postprocess_result for many documents at once:
+#   frame = bulk_postprocess(final_results)            # one row per document
+#   frame = bulk_postprocess(load_batch_results("batch_results.jsonl"))
+#
+# Gives the same "BOL #", "Card In time" and "Card Out time" values as the per-document path.
+
+import json
+
+import pandas as pd
+
+from postprocessing import field_resolver, BOL_VALUE_FRAGMENTS
+
+RESULT_COLUMNS = ["BOL #", "Card In time", "Card Out time"]
+NOT_FOUND = "Not Found"
+
+
+# Read batch_extract JSONL output into {key: final_result}
+def load_batch_results(path):
+    results = {}
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            results[record["key"]] = record.get("final", {})
+    return results
+
+
+# Flatten final_result dicts into one row per (document, mapping, key).
+# mapping 0 is the summary, mapping i is products[i - 1], the last mapping is the FORMS key/values;
+# position keeps key order inside a mapping.
+def results_to_frame(final_results):
+    items = final_results.items() if isinstance(final_results, dict) else enumerate(final_results)
+    doc_ids, mappings, positions, keys, values, is_str = [], [], [], [], [], []
+
+    for doc_id, final_result in items:
+        sources = [final_result.get("summary", {})] + list(final_result.get("products", [])) + [final_result.get("forms", {})]
+        for mapping, source in enumerate(sources):
+            for position, (key, value) in enumerate(source.items()):
+                if not isinstance(key, str):
+                    continue
+                doc_ids.append(doc_id)
+                mappings.append(mapping)
+                positions.append(position)
+                keys.append(key)
+                values.append(value)
+                is_str.append(isinstance(value, str))
+
+    frame = pd.DataFrame({
+        "doc_id": doc_ids,
+        "mapping": pd.array(mappings, dtype="int32"),
+        "position": pd.array(positions, dtype="int32"),
+        "key": keys,
+        "value": pd.Series(values, dtype="object"),
+        "is_str": pd.array(is_str, dtype="bool"),
+    })
+    return frame
+
+
+# Vectorized clean_text over the string values
+def clean_values(frame):
+    text = frame["value"].where(frame["is_str"]).astype("string")
+    cleaned = text.str.replace("\n", " ", regex=False).str.replace("\r", "", regex=False).str.strip()
+    frame["value"] = cleaned.astype("object").where(frame["is_str"], frame["value"])
+    frame["nonempty"] = (cleaned.str.len() > 0).fillna(False).astype(bool)
+    return frame
+
+
+# Keyword matches for each distinct key, as (key, field, priority) rows
+def _key_matches(keys, resolver):
+    rows = []
+    for key in keys:
+        for field, priorities in resolver.match_key(key).items():
+            rows.extend((key, field, priority) for priority in priorities)
+    return pd.DataFrame(rows, columns=["key", "field", "priority"])
+
+
+# Same rule as FieldResolver: per mapping and keyword, the first key containing the keyword,
+# accepted when its value is non-empty; lowest priority wins, summary before products
+def resolve_fields(frame, resolver=None):
+    resolver = resolver or field_resolver
+    matches = _key_matches(frame["key"].unique(), resolver)
+    if matches.empty:
+        return pd.DataFrame(columns=["doc_id", "field", "value"])
+
+    hits = frame[frame["is_str"]].merge(matches, on="key")
+    hits = hits.sort_values(["doc_id", "mapping", "field", "priority", "position"], kind="stable")
+    hits = hits.drop_duplicates(["doc_id", "mapping", "field", "priority"])
+    hits = hits[hits["nonempty"]]
+    hits = hits.sort_values(["doc_id", "field", "mapping", "priority"], kind="stable")
+    hits = hits.drop_duplicates(["doc_id", "field"])
+    return hits[["doc_id", "field", "value"]]
+
+
+# BOL numbers written inline in a summary value, e.g. "Bill of Lading # 12345"
+def _bol_from_values(frame, doc_ids):
+    summary = frame[(frame["mapping"] == 0) & frame["is_str"]]
+    lowered = summary["value"].astype("string").str.lower()
+    found = pd.Series(pd.NA, index=doc_ids, dtype="string")
+
+    for fragment in BOL_VALUE_FRAGMENTS:
+        first = summary[lowered.str.contains(fragment, regex=False).fillna(False)].drop_duplicates("doc_id")
+        digits = first["value"].astype("string").str.extract(r"(\d+)", expand=False)
+        digits.index = first["doc_id"]
+        found = found.combine_first(digits.dropna())
+
+    return found.reindex(doc_ids)
+
+
+# One row per document with the post-processed columns, indexed by document key or position
+def bulk_postprocess(final_results, resolver=None):
+    frame = clean_values(results_to_frame(final_results))
+    doc_ids = pd.Index(list(final_results.keys()) if isinstance(final_results, dict) else range(len(final_results)), name="doc_id")
+
+    resolved = resolve_fields(frame, resolver).pivot(index="doc_id", columns="field", values="value")
+    result = resolved.reindex(index=doc_ids, columns=RESULT_COLUMNS)
+    result.columns.name = None
+
+    bol = result["BOL #"].where(result["BOL #"].map(lambda value: isinstance(value, str)))
+    bol = bol.astype("string").combine_first(_bol_from_values(frame, doc_ids))
+    bol = bol.str.replace(r"\D", "", regex=True)
+    result["BOL #"] = bol.where(bol.str.len() > 0)
+
+    return result.astype("object").where(result.notna(), NOT_FOUND)
@@ -0,0 +1,223 @@
+# extraction.py
+
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from pdf2image import convert_from_path, pdfinfo_from_path
+from try2 import extract_summary_fields, extract_line_items
+from textract_calls import run_concurrently, submit, result_within
+from postprocessing import clean_summary_data, clean_products_data, unresolved_fields
+from metrics import registry, span, timed
+from rate_limiter import get_limiter
+from block_index import index_blocks, merge_indexes, table_records, line_key_values
+from image_prep import prepare_image_bytes, prepare_pil_image, prep_signature, IMAGE_PREP_ENABLED
+
+logger = logging.getLogger("TextractLogger")
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+IMAGE_CONTENT_TYPES = ['image/jpeg', 'image/png']
+
+# PDF pages are rendered one at a time; at most this many pages are held or in flight per document
+PDF_PAGE_WINDOW = int(os.environ.get("PDF_PAGE_WINDOW", 4))
+PDF_DPI = int(os.environ.get("PDF_DPI", 150 if IMAGE_PREP_ENABLED else 200))
+# Most Textract calls one document has in flight at once: two for images, the page window for PDFs.
+# Callers processing N documents concurrently reserve N times this many call threads.
+CALLS_PER_DOCUMENT = max(2, PDF_PAGE_WINDOW)
+
+
+# S3 keys are routed on their extension, uploads on their content type
+def is_image_key(key):
+    return key.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def fetch_s3_document(s3, bucket, key):
+    with span("s3_get_object") as info:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+        file_data = obj['Body'].read()
+        info["bytes"] = len(file_data)
+    return file_data
+
+
+# file_data may be a callable returning the bytes to send, see TextractCache.call for key_data and variant
+def _call_textract(textract, cache, api_name, file_data, key_data=None, variant=None, **kwargs):
+    limiter = get_limiter(api_name)
+
+    # Only real API calls are timed and rate limited; cache hits never reach api_fn
+    def timed_call(Document, **params):
+        with span(f"textract_{api_name}", len(Document['Bytes'])):
+            return getattr(textract, api_name)(Document=Document, **params)
+
+    def api_fn(Document, **params):
+        return limiter.call(timed_call, Document=Document, **params)
+
+    if cache is None:
+        return api_fn(Document={'Bytes': file_data() if callable(file_data) else file_data}, **kwargs)
+    return cache.call(api_name, api_fn, file_data, key_data=key_data, variant=variant, **kwargs)
+
+
+# Prepares an image on first use only, so cache hits skip the decode/resize/encode entirely.
+# Both Textract calls share one preparation; its stats are merged into stats when it runs.
+def _lazy_prepared_image(file_data, stats):
+    lock = threading.Lock()
+    prepared = []
+
+    def get():
+        with lock:
+            if not prepared:
+                with span("image_prep", len(file_data)):
+                    data, prep_stats = prepare_image_bytes(file_data)
+                stats.update(prep_stats)
+                prepared.append(data)
+            return prepared[0]
+
+    return get
+
+
+# How images get their second Textract call:
+#   eager        analyze_expense and analyze_document (TABLES+FORMS) concurrently
+#   lazy         analyze_expense first; analyze_document only if a target field is still "Not Found"
+#   lazy_detect  as lazy, with the cheaper detect_document_text ("Key: value" lines) as the second call
+SECOND_CALL_MODES = ("eager", "lazy", "lazy_detect")
+SECOND_CALL_MODE = os.environ.get("TEXTRACT_SECOND_CALL", "eager")
+
+
+@timed("index_blocks")
+def _index_response(response_doc):
+    return index_blocks(response_doc)
+
+
+# Render PDF pages lazily, yielding encoded bytes for one page at a time
+def iter_pdf_pages(file_data, dpi=PDF_DPI):
+    # poppler reads from a path; write the PDF once rather than once per rendered page
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = os.path.join(temp_dir, "document.pdf")
+        with open(pdf_path, 'wb') as pdf_file:
+            pdf_file.write(file_data)
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+        for page_number in range(1, page_count + 1):
+            with span("pdf_render") as info:
+                page = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=IMAGE_PREP_ENABLED)[0]
+                if IMAGE_PREP_ENABLED:
+                    page_bytes, _ = prepare_pil_image(page)
+                else:
+                    img_bytes = io.BytesIO()
+                    page.save(img_bytes, format='PNG')
+                    page_bytes = img_bytes.getvalue()
+                page.close()
+                info["bytes"] = len(page_bytes)
+            yield page_bytes
+
+
+# Send pages to analyze_document with a bounded window and index their blocks in page order.
+# The next page renders while earlier pages are still with Textract.
+def extract_pdf_index(textract, file_data, cache=None, window=PDF_PAGE_WINDOW, stats=None):
+    in_flight = deque()
+    page_indexes = []
+    stats = stats if stats is not None else {}
+    stats.update({"pages": 0, "prepared_bytes": 0})
+
+    def drain_one():
+        response_doc = result_within(in_flight.popleft())
+        page_indexes.append(_index_response(response_doc))
+
+    try:
+        for page_bytes in iter_pdf_pages(file_data):
+            stats["pages"] += 1
+            stats["prepared_bytes"] += len(page_bytes)
+            in_flight.append(submit(_call_textract, textract, cache, 'analyze_document', page_bytes, FeatureTypes=['TABLES', 'FORMS']))
+            if len(in_flight) >= window:
+                drain_one()
+        while in_flight:
+            drain_one()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+    return merge_indexes(page_indexes)
+
+
+# Run the Textract calls for one document and return the cleaned final_result.
+# Failed calls are reported under final_result['errors']; if every call fails the error is raised.
+# Payload size and timing go into the optional stats dict and the log.
+@timed("extract_document")
+def extract_document(textract, file_data, is_image, cache=None, stats=None, second_call=None):
+    line_items = []
+    doc_index = {'lines': [], 'key_values': {}, 'tables': []}
+    errors = {}
+    stats = stats if stats is not None else {}
+    start = time.perf_counter()
+
+    if is_image:
+        stats["original_bytes"] = len(file_data)
+        prepared = _lazy_prepared_image(file_data, stats)
+        image_key = {'key_data': file_data, 'variant': prep_signature()}
+        mode = second_call or SECOND_CALL_MODE
+        if mode not in SECOND_CALL_MODES:
+            raise ValueError(f"Unknown second call mode: {mode}")
+        second_api = 'detect_document_text' if mode == 'lazy_detect' else 'analyze_document'
+        second_params = {'FeatureTypes': ['TABLES', 'FORMS']} if second_api == 'analyze_document' else {}
+        expense_call = lambda: _call_textract(textract, cache, 'analyze_expense', prepared, **image_key)
+        document_call = lambda: _call_textract(textract, cache, second_api, prepared, **image_key, **second_params)
+
+        if mode == 'eager':
+            calls = run_concurrently({'analyze_expense': expense_call, second_api: document_call})
+        else:
+            calls = run_concurrently({'analyze_expense': expense_call})
+
+        summary_data = {}
+        if calls['analyze_expense'].ok:
+            summary_data = extract_summary_fields(calls['analyze_expense'].result, logger)
+            line_items = extract_line_items(calls['analyze_expense'].result, logger)
+
+        if mode != 'eager':
+            # Summary and product keys are resolved before FORMS, so when they already match every field
+            # the second call could not change the post-processed result
+            missing = unresolved_fields({
+                'summary': clean_summary_data(summary_data), 'products': clean_products_data(line_items),
+            }) if calls['analyze_expense'].ok else ['analyze_expense failed']
+            stats["second_call_avoided"] = not missing
+            if missing:
+                stats["second_call_reason"] = missing
+                calls.update(run_concurrently({second_api: document_call}))
+            registry.inc("second_calls_avoided_total" if not missing else "second_calls_made_total")
+        stats["second_call"] = second_api if second_api in calls else None
+
+        for name, call in calls.items():
+            if not call.ok:
+                logger.error(f"{name} failed: {call.error}")
+                errors[name] = str(call.error)
+        if len(errors) == len(calls):
+            raise RuntimeError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+
+        if second_api in calls and calls[second_api].ok:
+            doc_index = _index_response(calls[second_api].result)
+            if second_api == 'detect_document_text':
+                doc_index['key_values'] = line_key_values(doc_index['lines'])
+
+    else:
+        stats["original_bytes"] = len(file_data)
+        doc_index = extract_pdf_index(textract, file_data, cache=cache, stats=stats)
+
+        # PDFs have no expense analysis; table rows stand in for line items
+        summary_data = {'lines': doc_index['lines']}
+        line_items = table_records(doc_index['tables'])
+
+    stats["textract_seconds"] = round(time.perf_counter() - start - stats.get("prep_seconds", 0), 4)
+    logger.info("Payload stats", extra={"data": stats})
+
+    final_result = {'summary': summary_data, 'products': line_items}
+    final_result['summary'] = clean_summary_data(final_result['summary'])
+    final_result['products'] = clean_products_data(final_result['products'])
+    # FORMS key/value pairs and TABLES from analyze_document, kept next to the expense fields
+    if doc_index['key_values']:
+        final_result['forms'] = clean_summary_data(doc_index['key_values'])
+    if doc_index['tables']:
+        final_result['tables'] = doc_index['tables']
+    if errors:
+        final_result['errors'] = errors
+
+    return final_result
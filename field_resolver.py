@@ -0,0 +1,163 @@
+# field_resolver.py
+
+from collections import deque, namedtuple
+from functools import lru_cache
+
+# Result of resolving one target field: the value, the document key it came from,
+# the keyword that matched and whether it was found in the summary or a product
+FieldMatch = namedtuple("FieldMatch", ["value", "key", "keyword", "source"])
+
+
+# Aho-Corasick automaton over lowercased keywords; find_all reports every keyword
+# occurring in a text in a single left-to-right scan, overlaps included
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+
+        for keyword, payload in keywords:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                state = next_state
+            self._output[state].add(payload)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+        self._output = [frozenset(payloads) for payloads in self._output]
+
+    def find_all(self, text):
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found |= self._output[state]
+        return found
+
+
+# Keywords as the resolver matches them: lowercased, first occurrence keeps its priority
+def normalize_keywords(keywords):
+    lowered = []
+    for keyword in keywords:
+        keyword = keyword.lower()
+        if keyword not in lowered:
+            lowered.append(keyword)
+    return lowered
+
+
+def _longest_common_subsequence(first, second):
+    lengths = [[0] * (len(second) + 1) for _ in range(len(first) + 1)]
+    for i, a in enumerate(first):
+        for j, b in enumerate(second):
+            lengths[i + 1][j + 1] = lengths[i][j] + 1 if a == b else max(lengths[i][j + 1], lengths[i + 1][j])
+    common = []
+    i, j = len(first), len(second)
+    while i and j:
+        if first[i - 1] == second[j - 1]:
+            common.append(first[i - 1])
+            i, j = i - 1, j - 1
+        elif lengths[i - 1][j] >= lengths[i][j - 1]:
+            i -= 1
+        else:
+            j -= 1
+    return set(common)
+
+
+# Keywords whose edit can change a resolved value, per field: added and removed keywords plus
+# those that moved relative to the others. A document none of whose keys contains one of these
+# keywords resolves exactly as before, because the surviving keywords it matches keep their order.
+def changed_keywords(old_rules, new_rules):
+    changed = {}
+    for field in set(old_rules) | set(new_rules):
+        old = normalize_keywords(old_rules.get(field, []))
+        new = normalize_keywords(new_rules.get(field, []))
+        common_old = [keyword for keyword in old if keyword in new]
+        common_new = [keyword for keyword in new if keyword in old]
+        touched = set(old) ^ set(new)
+        if common_old != common_new:
+            touched |= set(common_old) - _longest_common_subsequence(common_old, common_new)
+        if touched:
+            changed[field] = touched
+    return changed
+
+
+# Resolves every target field in one pass over a document's summary keys, then product keys,
+# then the FORMS key/value pairs from analyze_document. Only string values are candidates.
+# rules maps an output field name to its keyword list, highest priority first. Per field the
+# original lookup order is kept: for each keyword in priority order, the first key containing it
+# is taken, and the keyword is accepted if that key's value is non-empty.
+class FieldResolver:
+    def __init__(self, rules, cache_size=65536):
+        self.rules = {field: list(keywords) for field, keywords in rules.items()}
+        self._keywords = {}
+        entries = []
+        for field, keywords in self.rules.items():
+            lowered = normalize_keywords(keywords)
+            self._keywords[field] = lowered
+            entries.extend((keyword, (field, priority)) for priority, keyword in enumerate(lowered))
+
+        self._matcher = KeywordMatcher(entries)
+        # Document keys repeat heavily across a backlog, so scans are memoized per distinct key
+        self.match_key = lru_cache(maxsize=cache_size)(self._match_key)
+
+    # Map a raw key to {field: sorted keyword priorities it contains}
+    def _match_key(self, key):
+        matches = {}
+        for field, priority in self._matcher.find_all(key.lower()):
+            matches.setdefault(field, []).append(priority)
+        return {field: tuple(sorted(priorities)) for field, priorities in matches.items()}
+
+    def _resolve_mapping(self, mapping, fields, source):
+        first_keys = {field: {} for field in fields}
+        for key, value in mapping.items():
+            if not isinstance(key, str) or not isinstance(value, str):
+                continue
+            for field, priorities in self.match_key(key).items():
+                if field in first_keys:
+                    for priority in priorities:
+                        first_keys[field].setdefault(priority, key)
+
+        resolved = {}
+        for field, keys_by_priority in first_keys.items():
+            for priority in sorted(keys_by_priority):
+                key = keys_by_priority[priority]
+                if mapping[key]:
+                    resolved[field] = FieldMatch(mapping[key], key, self._keywords[field][priority], source)
+                    break
+        return resolved
+
+    # Return {field: FieldMatch or None} for every field in the rules
+    def resolve(self, final_result, fields=None):
+        pending = list(fields or self.rules)
+        resolved = self._resolve_mapping(final_result.get("summary", {}), pending, "summary")
+
+        for index, product in enumerate(final_result.get("products", [])):
+            pending = [field for field in pending if field not in resolved]
+            if not pending:
+                break
+            resolved.update(self._resolve_mapping(product, pending, f"products[{index}]"))
+
+        pending = [field for field in pending if field not in resolved]
+        if pending and final_result.get("forms"):
+            resolved.update(self._resolve_mapping(final_result["forms"], pending, "forms"))
+
+        return {field: resolved.get(field) for field in (fields or self.rules)}
@@ -0,0 +1,92 @@
+# image_prep.py
+
+import io
+import os
+import time
+
+from PIL import Image, ImageOps
+
+# Preparation settings; IMAGE_PREP_ENABLED=0 sends the original bytes, for A/B latency comparisons
+IMAGE_PREP_ENABLED = os.environ.get("IMAGE_PREP_ENABLED", "1") != "0"
+# Longest edge kept for photos, roughly 200 DPI across a letter-size page
+IMAGE_MAX_DIMENSION = int(os.environ.get("IMAGE_MAX_DIMENSION", 2200))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", 85))
+# Longest edge of the preview shown in the app
+THUMBNAIL_MAX_DIMENSION = int(os.environ.get("THUMBNAIL_MAX_DIMENSION", 900))
+# Synchronous Textract calls reject documents larger than 5 MB
+TEXTRACT_MAX_BYTES = 5 * 1024 * 1024
+# Bump when prepare_pil_image changes what it sends, so cached responses are not reused across versions
+IMAGE_PREP_VERSION = 1
+
+
+# Identifies how original bytes are turned into the bytes sent to Textract. Cached responses are
+# keyed on the original bytes plus this, so a repeat lookup never has to prepare the image.
+def prep_signature(max_dimension=IMAGE_MAX_DIMENSION):
+    if not IMAGE_PREP_ENABLED:
+        return "prep:off"
+    return f"prep:v{IMAGE_PREP_VERSION}:{max_dimension}:{IMAGE_JPEG_QUALITY}:{TEXTRACT_MAX_BYTES}"
+
+
+def _encode(image, format, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+# Grayscale and downscale an already-decoded image, then keep whichever of JPEG/PNG is smaller
+def prepare_pil_image(image, max_dimension=IMAGE_MAX_DIMENSION):
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'L':
+        image = image.convert('L')
+
+    if max(image.size) > max_dimension:
+        image = image.copy()
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    candidates = [
+        ('JPEG', _encode(image, 'JPEG', quality=IMAGE_JPEG_QUALITY)),
+        ('PNG', _encode(image, 'PNG')),
+    ]
+    format, data = min(candidates, key=lambda candidate: len(candidate[1]))
+
+    # Keep shrinking until the payload fits the synchronous API limit
+    while len(data) > TEXTRACT_MAX_BYTES and max(image.size) > 800:
+        image = image.resize((int(image.width * 0.8), int(image.height * 0.8)), Image.LANCZOS)
+        format, data = 'JPEG', _encode(image, 'JPEG', quality=IMAGE_JPEG_QUALITY)
+
+    return data, format
+
+
+# Prepare raw image bytes for Textract and report what changed.
+# Falls back to the original bytes when they are already smaller or cannot be decoded.
+def prepare_image_bytes(file_data, max_dimension=IMAGE_MAX_DIMENSION):
+    start = time.perf_counter()
+    stats = {"original_bytes": len(file_data), "format": "original"}
+    prepared = file_data
+
+    if IMAGE_PREP_ENABLED:
+        try:
+            with Image.open(io.BytesIO(file_data)) as image:
+                oversized = max(image.size) > max_dimension
+                data, format = prepare_pil_image(image, max_dimension)
+            if len(data) < len(file_data) or oversized or len(file_data) > TEXTRACT_MAX_BYTES:
+                prepared = data
+                stats["format"] = format
+        except Exception as e:
+            stats["error"] = str(e)
+
+    stats["prepared_bytes"] = len(prepared)
+    stats["bytes_saved"] = len(file_data) - len(prepared)
+    stats["prep_seconds"] = round(time.perf_counter() - start, 4)
+    return prepared, stats
+
+
+# Small JPEG preview for display; draft() lets PIL decode JPEGs at a reduced scale directly
+def make_thumbnail(file_data, max_dimension=THUMBNAIL_MAX_DIMENSION):
+    with Image.open(io.BytesIO(file_data)) as image:
+        image.draft('RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        return _encode(image, 'JPEG', quality=80)
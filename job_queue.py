@@ -0,0 +1,319 @@
+# job_queue.py
+#
+# Persistent SQLite job queue with background workers running the extraction pipeline.
+# The Streamlit app submits jobs and polls them; extra worker processes can share the queue:
+#   python job_queue.py worker --workers 8
+#   python job_queue.py submit --keys s3_filenames.txt --limit 100
+#   python job_queue.py status
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from extraction import CALLS_PER_DOCUMENT
+from log_setup import configure_logging
+from metrics import export_if_configured
+from pipeline import process_document, content_hash
+from sqlite_store import SQLiteStore, process_default
+from textract_calls import reserve_call_workers, release_call_workers
+
+logger = logging.getLogger("TextractLogger")
+
+JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", os.path.join(".textract_cache", "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+# A running job whose lease expires (worker crashed or was restarted) is picked up again, or marked
+# failed once it has used up its attempts. Workers renew the leases of jobs they are still running.
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", 600))
+JOB_POLL_SECONDS = 0.5
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bucket TEXT,
+    key TEXT,
+    content_hash TEXT,
+    is_image INTEGER,
+    document BLOB,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (bucket, key);
+CREATE INDEX IF NOT EXISTS jobs_content_hash ON jobs (content_hash);
+"""
+
+_JOB_COLUMNS = "id, bucket, key, content_hash, status, attempts, created_at, started_at, finished_at, result, error"
+
+
+def _job_from_row(row):
+    job = dict(zip([column.strip() for column in _JOB_COLUMNS.split(",")], row))
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue(SQLiteStore):
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.wakeup = threading.Event()
+        super().__init__(path, _SCHEMA)
+
+    # Queue a document by S3 key or by uploaded bytes. With dedupe, a queued or running job for the
+    # same document is returned instead of adding a second one. Finished jobs are not reused: their
+    # results predate later rule changes and S3 overwrites, and a rerun of an unchanged document is
+    # served by the Textract cache.
+    def submit(self, bucket=None, key=None, file_data=None, is_image=None, dedupe=True, max_attempts=JOB_MAX_ATTEMPTS):
+        digest = content_hash(file_data) if file_data is not None else None
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if dedupe:
+                if digest is not None:
+                    row = conn.execute(
+                        "SELECT id FROM jobs WHERE content_hash = ? AND status IN (?, ?) ORDER BY id DESC LIMIT 1", (digest, QUEUED, RUNNING)
+                    ).fetchone()
+                else:
+                    row = conn.execute(
+                        "SELECT id FROM jobs WHERE bucket = ? AND key = ? AND content_hash IS NULL AND status IN (?, ?) ORDER BY id DESC LIMIT 1",
+                        (bucket, key, QUEUED, RUNNING),
+                    ).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return row[0]
+
+            now = time.time()
+            job_id = conn.execute(
+                "INSERT INTO jobs (bucket, key, content_hash, is_image, document, status, max_attempts, not_before, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (bucket, key, digest, None if is_image is None else int(is_image), file_data, QUEUED, max_attempts, now, now),
+            ).lastrowid
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.wakeup.set()
+        return job_id
+
+    def submit_many(self, bucket, keys, dedupe=True):
+        return [self.submit(bucket=bucket, key=key, dedupe=dedupe) for key in keys]
+
+    # Atomically take the oldest runnable job, including jobs whose lease has expired. An expired job
+    # with no attempts left (it crashed or hung every worker that took it) is failed instead.
+    def claim(self, worker_id, lease_seconds=JOB_LEASE_SECONDS):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                (FAILED, "Lease expired on the last attempt (worker crashed or was stopped)", now, RUNNING, now),
+            )
+            row = conn.execute(
+                "SELECT id, bucket, key, is_image, document FROM jobs "
+                "WHERE (status = ? AND not_before <= ?) OR (status = ? AND lease_until < ?) ORDER BY id LIMIT 1",
+                (QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, lease_until = ?, started_at = ? WHERE id = ?",
+                    (RUNNING, worker_id, now + lease_seconds, now, row[0]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {"id": row[0], "bucket": row[1], "key": row[2], "is_image": None if row[3] is None else bool(row[3]), "document": row[4]}
+
+    # Extend the lease of a job this worker is still running; False if the job is no longer its own
+    def renew(self, job_id, worker_id, lease_seconds=JOB_LEASE_SECONDS):
+        return self._connect().execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+            (time.time() + lease_seconds, job_id, worker_id, RUNNING),
+        ).rowcount > 0
+
+    def complete(self, job_id, worker_id, result):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, document = NULL, finished_at = ?, lease_until = NULL "
+            "WHERE id = ? AND worker = ?",
+            (DONE, json.dumps(result, default=str), time.time(), job_id, worker_id),
+        )
+
+    # Retry with exponential backoff until max_attempts, then mark the job failed
+    def fail(self, job_id, worker_id, error):
+        conn = self._connect()
+        attempts, max_attempts = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if attempts < max_attempts:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, not_before = ?, lease_until = NULL WHERE id = ? AND worker = ?",
+                (QUEUED, str(error), time.time() + 2 ** attempts, job_id, worker_id),
+            )
+        else:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ? AND worker = ?",
+                (FAILED, str(error), time.time(), job_id, worker_id),
+            )
+
+    # Re-queue a failed job. Uploaded bytes are kept until a job is done, so uploads can be retried
+    # too; False if the job is not failed or has nothing left to process.
+    def retry(self, job_id):
+        retried = self._connect().execute(
+            "UPDATE jobs SET status = ?, attempts = 0, not_before = ?, error = NULL "
+            "WHERE id = ? AND status = ? AND (bucket IS NOT NULL OR document IS NOT NULL)",
+            (QUEUED, time.time(), job_id, FAILED),
+        ).rowcount > 0
+        self.wakeup.set()
+        return retried
+
+    def get(self, job_id):
+        row = self._connect().execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+
+    def get_many(self, job_ids):
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" * len(job_ids))
+        rows = self._connect().execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id IN ({placeholders})", list(job_ids)).fetchall()
+        jobs = {row[0]: _job_from_row(row) for row in rows}
+        return [jobs[job_id] for job_id in job_ids if job_id in jobs]
+
+    # Number of queued jobs ahead of this one
+    def position(self, job_id):
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND id < ?", (QUEUED, job_id)).fetchone()[0]
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+
+# Threads that claim jobs from the queue and run them through pipeline.process_document.
+# A heartbeat thread renews the leases of running jobs, so long documents are not claimed twice.
+class JobWorkerPool:
+    def __init__(self, queue, workers=JOB_WORKERS, process_fn=None, lease_seconds=JOB_LEASE_SECONDS):
+        self.queue = queue
+        self.workers = workers
+        self.process_fn = process_fn or process_document
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._threads = []
+        self._running = {}
+        self._running_lock = threading.Lock()
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+    def start(self):
+        reserve_call_workers(self.workers * CALLS_PER_DOCUMENT)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(f"{self._prefix}:{index}",), name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self.queue.wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        release_call_workers(self.workers * CALLS_PER_DOCUMENT)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._running_lock:
+                running = list(self._running.items())
+            for worker_id, job_id in running:
+                try:
+                    self.queue.renew(job_id, worker_id, self.lease_seconds)
+                except sqlite3.Error as e:
+                    logger.warning(f"Lease renewal for job {job_id} failed: {e}")
+
+    def _run(self, worker_id):
+        while not self._stop.is_set():
+            job = self.queue.claim(worker_id, self.lease_seconds)
+            if job is None:
+                self.queue.wakeup.wait(JOB_POLL_SECONDS)
+                self.queue.wakeup.clear()
+                continue
+            with self._running_lock:
+                self._running[worker_id] = job["id"]
+            try:
+                final_result, processed_result, payload = self.process_fn(
+                    bucket=job["bucket"], key=job["key"], file_data=job["document"], is_image=job["is_image"],
+                )
+                self.queue.complete(job["id"], worker_id, {"final": final_result, "processed": processed_result, "payload": payload})
+            except Exception as e:
+                logger.error(f"Job {job['id']} ({job['key']}) failed: {e}")
+                self.queue.fail(job["id"], worker_id, e)
+            finally:
+                with self._running_lock:
+                    self._running.pop(worker_id, None)
+
+
+get_default_queue = process_default(JobQueue)
+
+
+def _start_default_pool(workers=JOB_WORKERS):
+    return JobWorkerPool(get_default_queue(), workers).start()
+
+
+# Queue plus a worker pool started once per process
+get_default_worker_pool = process_default(_start_default_pool)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent Textract job queue")
+    parser.add_argument("--path", default=JOB_QUEUE_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    worker = subparsers.add_parser("worker", help="run a pool of workers until interrupted")
+    worker.add_argument("--workers", type=int, default=JOB_WORKERS)
+    submit = subparsers.add_parser("submit", help="queue S3 keys from a file")
+    submit.add_argument("--keys", default="s3_filenames.txt")
+    submit.add_argument("--bucket", default="fp-prod-s3")
+    submit.add_argument("--limit", type=int, default=None)
+    subparsers.add_parser("status", help="print job counts by status")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.path)
+    if args.command == "worker":
+        configure_logging(console=True)
+        pool = JobWorkerPool(queue, args.workers).start()
+        try:
+            while True:
+                time.sleep(10)
+                logger.info(f"Queue: {json.dumps(queue.counts())}")
+                export_if_configured(force=True)
+        except KeyboardInterrupt:
+            pool.stop(timeout=30)
+    elif args.command == "submit":
+        from batch_extract import read_keys
+        keys = read_keys(args.keys)[:args.limit]
+        print(f"Queued {len(set(queue.submit_many(args.bucket, keys)))} jobs")
+    else:
+        print(json.dumps(queue.counts(), indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
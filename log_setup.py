@@ -0,0 +1,109 @@
+# log_setup.py
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOGGER_NAME = "TextractLogger"
+LOG_FILE = os.environ.get("TEXTRACT_LOG_FILE", "textract_processing.log")
+LOG_MAX_BYTES = int(os.environ.get("TEXTRACT_LOG_MAX_BYTES", 5 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get("TEXTRACT_LOG_BACKUP_COUNT", 3))
+# Fraction of documents whose full extracted payload is logged (1.0 = every document)
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("TEXTRACT_LOG_PAYLOAD_SAMPLE_RATE", 1.0))
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+# One compact JSON object per line; structured data passed as extra={"data": ...} is kept as JSON
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        data = getattr(record, "data", None)
+        if data is not None:
+            entry["data"] = data
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+# Hands records to the queue without formatting them, so JSON encoding happens on the writer thread.
+# Structured data is snapshotted here, since callers keep mutating the dicts they logged.
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if getattr(record, "data", None) is not None:
+            record.data = copy.deepcopy(record.data)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# Attach the queue handler and start the background writer once per process. console=True also
+# echoes plain-text lines to stderr, for command-line runs.
+# Safe to call on every Streamlit rerun; later calls return the already configured logger.
+def configure_logging(log_file=LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, level=logging.INFO, console=False):
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+
+    with _configure_lock:
+        if _listener is not None:
+            return logger
+
+        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+        file_handler.setFormatter(JsonLinesFormatter())
+        handlers = [file_handler]
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+            handlers.append(console_handler)
+
+        records = queue.SimpleQueue()
+        _listener = QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(_DeferredQueueHandler(records))
+        logger.setLevel(level)
+        logger.propagate = False
+
+    return logger
+
+
+# Deterministic per-key sampling, so a document is either always or never logged in full
+def should_log_payload(key, sample_rate=None):
+    sample_rate = LOG_PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+    if sample_rate >= 1.0:
+        return True
+    if sample_rate <= 0.0:
+        return False
+    return zlib.crc32(str(key).encode()) / 0xFFFFFFFF < sample_rate
+
+
+# Log a document's extracted result once, as structured data
+def log_document_payload(logger, key, final_result, processed_result=None, sample_rate=None):
+    if not should_log_payload(key, sample_rate):
+        return
+    data = {"key": str(key), "result": final_result}
+    if processed_result is not None:
+        data["processed"] = processed_result
+    logger.info("Extracted result", extra={"data": data})
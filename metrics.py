@@ -0,0 +1,220 @@
+# metrics.py
+
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency bucket upper bounds in seconds, shared by every stage
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_PREFIX = "bol_ocr"
+METRICS_PROM_FILE = os.environ.get("METRICS_PROM_FILE")
+METRICS_HTTP_PORT = os.environ.get("METRICS_HTTP_PORT")
+# Minimum seconds between METRICS_PROM_FILE rewrites from the per-document path
+METRICS_EXPORT_INTERVAL = float(os.environ.get("METRICS_EXPORT_INTERVAL", 15))
+
+logger = logging.getLogger("TextractLogger")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    # Estimate a quantile by linear interpolation inside the bucket that contains it
+    def quantile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+# Per-stage counts, errors, bytes and latency histograms for the whole process
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._bytes = {}
+        self._errors = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, stage, seconds, nbytes=None, error=False):
+        with self._lock:
+            self._latency.setdefault(stage, Histogram()).observe(seconds)
+            if nbytes is not None:
+                self._bytes[stage] = self._bytes.get(stage, 0) + nbytes
+            if error:
+                self._errors[stage] = self._errors.get(stage, 0) + 1
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    # Gauge read at export time: collect() returns {label value: current value}
+    def gauge(self, name, help_text, label, collect):
+        with self._lock:
+            self._gauges[name] = (help_text, label, collect)
+
+    # Rows for display: one dict per stage
+    def summary(self):
+        with self._lock:
+            return [
+                {
+                    "stage": stage,
+                    "count": histogram.count,
+                    "errors": self._errors.get(stage, 0),
+                    "bytes": self._bytes.get(stage, 0),
+                    "mean_ms": round(1000 * histogram.total / histogram.count, 1) if histogram.count else 0.0,
+                    "p50_ms": round(1000 * histogram.quantile(0.50), 1),
+                    "p95_ms": round(1000 * histogram.quantile(0.95), 1),
+                }
+                for stage, histogram in sorted(self._latency.items())
+            ]
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    # Prometheus text exposition format
+    def render_prometheus(self):
+        name = f"{METRICS_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Latency per processing stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self._latency.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+            lines += [f"# TYPE {METRICS_PREFIX}_stage_bytes_total counter"]
+            lines += [f'{METRICS_PREFIX}_stage_bytes_total{{stage="{stage}"}} {value}' for stage, value in sorted(self._bytes.items())]
+            lines += [f"# TYPE {METRICS_PREFIX}_stage_errors_total counter"]
+            lines += [f'{METRICS_PREFIX}_stage_errors_total{{stage="{stage}"}} {value}' for stage, value in sorted(self._errors.items())]
+            for counter, value in sorted(self._counters.items()):
+                lines += [f"# TYPE {METRICS_PREFIX}_{counter} counter", f"{METRICS_PREFIX}_{counter} {value}"]
+            gauges = sorted(self._gauges.items())
+        for gauge, (help_text, label, collect) in gauges:
+            lines += [f"# HELP {METRICS_PREFIX}_{gauge} {help_text}", f"# TYPE {METRICS_PREFIX}_{gauge} gauge"]
+            lines += [f'{METRICS_PREFIX}_{gauge}{{{label}="{key}"}} {value}' for key, value in sorted(collect().items())]
+        return "\n".join(lines) + "\n"
+
+    # Each write goes to its own temp file next to path, then atomically replaces it
+    def write_prometheus(self, path):
+        body = self.render_prometheus()
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                file.write(body)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._bytes.clear()
+            self._errors.clear()
+            self._counters.clear()
+
+
+registry = MetricsRegistry()
+
+
+# Time a block as one stage; set span["bytes"] inside the block to record a payload size
+@contextmanager
+def span(stage, nbytes=None):
+    info = {"bytes": nbytes}
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield info
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        registry.observe(stage, time.perf_counter() - start, info["bytes"], error=failed)
+
+
+# Decorator form of span for whole functions
+def timed(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_export_lock = threading.Lock()
+_last_export = [0.0]
+
+
+# Write the Prometheus file if METRICS_PROM_FILE is set, at most once per METRICS_EXPORT_INTERVAL
+# unless forced. A failed write is logged, never raised: callers have already finished their work.
+def export_if_configured(force=False):
+    if not METRICS_PROM_FILE:
+        return
+    with _export_lock:
+        now = time.monotonic()
+        if not force and now - _last_export[0] < METRICS_EXPORT_INTERVAL:
+            return
+        _last_export[0] = now
+        try:
+            registry.write_prometheus(METRICS_PROM_FILE)
+        except OSError as e:
+            logger.warning(f"Metrics export to {METRICS_PROM_FILE} failed: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+# Serve /metrics on a local port from a daemon thread, once per process
+def start_metrics_server(port=None):
+    global _server
+    port = int(port or METRICS_HTTP_PORT or 0)
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server
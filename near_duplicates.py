@@ -0,0 +1,208 @@
+# near_duplicates.py
+
+import io
+import os
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+from metrics import registry
+from sqlite_store import SQLiteStore, process_default
+
+NEAR_DUPLICATE_ENABLED = os.environ.get("NEAR_DUPLICATE_ENABLED", "1") != "0"
+NEAR_DUPLICATE_PATH = os.environ.get("NEAR_DUPLICATE_PATH", os.path.join(".textract_cache", "phash.sqlite3"))
+# Side of the low-frequency DCT block kept; 16 gives a 256-bit hash
+PHASH_SIZE = int(os.environ.get("PHASH_SIZE", 16))
+# Largest Hamming distance (out of PHASH_SIZE ** 2 bits) still treated as the same document
+PHASH_MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", 8))
+# Documents filled in on the same form template hash alike, so every hash match is verified on a
+# VERIFY_SIZE grayscale copy: after a light blur, no VERIFY_TILE square may differ on average by
+# more than VERIFY_MAX_DIFF gray levels. A changed digit exceeds that; recompression does not.
+VERIFY_SIZE = int(os.environ.get("NEAR_DUPLICATE_VERIFY_SIZE", 1024))
+VERIFY_TILE = 8
+VERIFY_MAX_DIFF = float(os.environ.get("NEAR_DUPLICATE_VERIFY_MAX_DIFF", 4.0))
+
+
+@lru_cache(maxsize=4)
+def _dct_matrix(size):
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+# DCT perceptual hash of a grayscale image: shrink to 4x the hash size, 2-D DCT, then one bit per
+# low-frequency coefficient above the median. Rescans, recompression and small exposure changes
+# flip few bits.
+def _phash_pixels(image, hash_size=PHASH_SIZE):
+    image_size = hash_size * 4
+    pixels = np.asarray(image.resize((image_size, image_size), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(image_size)
+    low = (dct @ pixels @ dct.T)[:hash_size, :hash_size].flatten()
+    bits = low > np.median(low[1:])
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def _open_gray(file_data, size):
+    with Image.open(io.BytesIO(file_data)) as image:
+        image.draft('L', (size, size))
+        image = ImageOps.exif_transpose(image).convert('L')
+    if max(image.size) > size:
+        image.thumbnail((size, size), Image.LANCZOS)
+    return image
+
+
+# Perceptual hash as an int, or None when the bytes are not a decodable image
+def perceptual_hash(file_data, hash_size=PHASH_SIZE):
+    try:
+        return _phash_pixels(_open_gray(file_data, hash_size * 8), hash_size)
+    except Exception:
+        return None
+
+
+# (perceptual hash, verification copy) from one decode, or None when the bytes are not an image.
+# The verification copy is the VERIFY_SIZE grayscale image as JPEG bytes, stored with the hash.
+def image_signature(file_data):
+    try:
+        image = _open_gray(file_data, VERIFY_SIZE)
+    except Exception:
+        return None
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return _phash_pixels(image), buffer.getvalue()
+
+
+def _verify_pixels(image, size):
+    image = image.resize(size, Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    pixels = np.asarray(image, dtype=np.float32)
+    # Paper brightness differs between copies; compare against each image's own background
+    return pixels - np.median(pixels)
+
+
+# True when two verification copies show the same page: same aspect ratio, and no tile differs
+# by more than max_diff gray levels on average
+def same_document(first, second, max_diff=VERIFY_MAX_DIFF):
+    first, second = Image.open(io.BytesIO(first)), Image.open(io.BytesIO(second))
+    if abs(first.width / first.height - second.width / second.height) > 0.02:
+        return False
+    size = first.size if first.width >= second.width else second.size
+    diff = np.abs(_verify_pixels(first, size) - _verify_pixels(second, size))
+    rows, columns = diff.shape[0] // VERIFY_TILE, diff.shape[1] // VERIFY_TILE
+    tiles = diff[:rows * VERIFY_TILE, :columns * VERIFY_TILE].reshape(rows, VERIFY_TILE, columns, VERIFY_TILE).mean(axis=(1, 3))
+    return float(tiles.max()) <= max_diff
+
+
+def hamming_distance(first, second):
+    return bin(first ^ second).count("1")
+
+
+# Burkhard-Keller tree over Hamming distance: a range query only descends into children whose
+# edge distance lies within max_distance of the query's distance to the node
+class BKTree:
+    def __init__(self):
+        self._root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    # [(distance, item)] within max_distance, nearest first
+    def search(self, value, max_distance):
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(found, key=lambda entry: entry[0])
+
+
+# Persistent hash -> document id index, mirrored into a BK-tree. Rows added by other processes
+# are picked up incrementally on the next lookup. Each document keeps only its latest hash; tree
+# entries for replaced hashes are skipped because their row is gone.
+class NearDuplicateIndex(SQLiteStore):
+    def __init__(self, path=NEAR_DUPLICATE_PATH, max_distance=PHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._tree = BKTree()
+        self._last_rowid = 0
+        super().__init__(
+            path,
+            "CREATE TABLE IF NOT EXISTS image_hashes (id INTEGER PRIMARY KEY AUTOINCREMENT, phash TEXT NOT NULL, "
+            "doc_id TEXT NOT NULL, created_at REAL NOT NULL, fingerprint BLOB);"
+            "CREATE UNIQUE INDEX IF NOT EXISTS image_hashes_doc ON image_hashes (doc_id, phash);",
+        )
+        conn = self._connect()
+        # Indexes created before matches were verified; their rows cannot be verified and never match
+        if "fingerprint" not in [row[1] for row in conn.execute("PRAGMA table_info(image_hashes)")]:
+            conn.execute("ALTER TABLE image_hashes ADD COLUMN fingerprint BLOB")
+
+    def _refresh(self):
+        rows = self._connect().execute(
+            "SELECT id, phash, doc_id FROM image_hashes WHERE id > ? ORDER BY id", (self._last_rowid,)
+        ).fetchall()
+        for rowid, phash, doc_id in rows:
+            self._tree.add(int(phash, 16), (doc_id, phash))
+            self._last_rowid = rowid
+
+    # Record a document's image, replacing whatever it showed before (e.g. an overwritten S3 object)
+    def add(self, phash, doc_id, fingerprint):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM image_hashes WHERE doc_id = ?", (doc_id,))
+            conn.execute(
+                "INSERT INTO image_hashes (phash, doc_id, created_at, fingerprint) VALUES (?, ?, ?, ?)",
+                (format(phash, "x"), doc_id, time.time(), fingerprint),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # Nearest stored document within the distance threshold whose verification copy shows the same
+    # page as fingerprint, as (doc_id, distance), or None. Documents in exclude are never returned.
+    def find(self, phash, fingerprint, max_distance=None, exclude=()):
+        with self._lock:
+            self._refresh()
+            matches = self._tree.search(phash, self.max_distance if max_distance is None else max_distance)
+        conn = self._connect()
+        for distance, (doc_id, stored_phash) in matches:
+            if doc_id in exclude:
+                continue
+            row = conn.execute(
+                "SELECT fingerprint FROM image_hashes WHERE doc_id = ? AND phash = ?", (doc_id, stored_phash)
+            ).fetchone()
+            if row is None or row[0] is None:
+                continue
+            if same_document(row[0], fingerprint):
+                return doc_id, distance
+            registry.inc("dedup_rejected_total")
+        return None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM image_hashes").fetchone()[0]
+
+
+get_default_index = process_default(NearDuplicateIndex)
@@ -0,0 +1,113 @@
+# pipeline.py
+
+import hashlib
+import logging
+import threading
+import time
+
+from aws_clients import get_s3_client, get_textract_client
+from extraction import extract_document, fetch_s3_document, is_image_key
+from log_setup import log_document_payload
+from metrics import registry, span, export_if_configured
+from near_duplicates import get_default_index, image_signature, NEAR_DUPLICATE_ENABLED
+from postprocessing import postprocess_result, rules_snapshot, RULES_VERSION
+from results_store import document_id, get_default_store
+from single_flight import document_flight
+from textract_cache import get_default_cache
+
+logger = logging.getLogger("TextractLogger")
+
+_defaults = {"s3": None, "textract": None}
+_defaults_lock = threading.Lock()
+
+
+# Let the hosting app pin the clients used by default, e.g. the Streamlit app's credentialed Textract client
+def set_default_clients(s3=None, textract=None):
+    with _defaults_lock:
+        if s3 is not None:
+            _defaults["s3"] = s3
+        if textract is not None:
+            _defaults["textract"] = textract
+
+
+def default_s3_client():
+    return _defaults["s3"] or get_s3_client()
+
+
+def default_textract_client():
+    return _defaults["textract"] or get_textract_client()
+
+
+def content_hash(file_data):
+    return hashlib.sha256(file_data).hexdigest()
+
+
+# Stored final_result of a visually near-identical other document, marked as a dedup hit, or None.
+# The document's own entry and byte-identical documents are skipped: a reprocess must not overwrite
+# its first-hand result with a copy of itself, and exact repeats are served by the Textract cache.
+def _near_duplicate_result(results, signature, own_doc_id, digest, payload):
+    match = get_default_index().find(*signature, exclude={own_doc_id})
+    stored = results.get(match[0]) if match else None
+    if stored is None or stored["content_hash"] == digest:
+        return None
+    doc_id, distance = match
+    final_result = {name: value for name, value in stored["final"].items() if name != 'dedup'}
+    final_result['dedup'] = {'of': doc_id, 'distance': distance}
+    payload.update({"dedup_hit": True, "dedup_of": doc_id, "dedup_distance": distance})
+    registry.inc("dedup_hits_total")
+    return final_result
+
+
+# Full processing for one document: S3 fetch (when only a key is given), Textract and post-processing.
+# Identical documents already in flight in this process are coalesced into one run, and every
+# result is written to the results store. Returns (final_result, processed_result, payload stats).
+def process_document(bucket=None, key=None, file_data=None, is_image=None, s3=None, textract=None, cache=None, use_cache=True,
+                     store=None, use_store=True, second_call=None, dedup=None):
+    if is_image is None:
+        is_image = is_image_key(key)
+    if file_data is None:
+        flight_key = ('s3', bucket, key)
+    else:
+        flight_key = ('upload', content_hash(file_data))
+    log_key = key or flight_key[1]
+    # Near-duplicate reuse points at stored results, so it needs the results store
+    dedup = use_store and is_image and (NEAR_DUPLICATE_ENABLED if dedup is None else dedup)
+
+    def run():
+        start = time.perf_counter()
+        data = file_data if file_data is not None else fetch_s3_document(s3 or default_s3_client(), bucket, key)
+        results = (store or get_default_store()) if use_store else None
+        payload = {}
+
+        digest = content_hash(data)
+        doc_id = document_id(bucket if file_data is None else None, key, digest)
+        signature = None
+        final_result = None
+        if dedup:
+            with span("perceptual_hash", len(data)):
+                signature = image_signature(data)
+            final_result = _near_duplicate_result(results, signature, doc_id, digest, payload) if signature is not None else None
+
+        if final_result is None:
+            final_result = extract_document(
+                textract or default_textract_client(), data, is_image,
+                cache=cache or (get_default_cache() if use_cache else None), stats=payload, second_call=second_call,
+            )
+        processed_result = postprocess_result(final_result)
+        payload["latency_seconds"] = round(time.perf_counter() - start, 4)
+        log_document_payload(logger, log_key, final_result, processed_result)
+        if results is not None:
+            results.save_rules(RULES_VERSION, rules_snapshot())
+            doc_id = results.record(
+                bucket if file_data is None else None, key, digest, final_result, processed_result, payload,
+                rules_version=RULES_VERSION,
+            )
+            # Only complete, first-hand results become reuse targets
+            if signature is not None and not payload.get("dedup_hit") and 'errors' not in final_result:
+                get_default_index().add(signature[0], doc_id, signature[1])
+        return final_result, processed_result, payload
+
+    with span("document_total"):
+        result = document_flight.do(flight_key, run)
+    export_if_configured()
+    return result
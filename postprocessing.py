@@ -0,0 +1,132 @@
+# postprocessing.py
+
+import hashlib
+import json
+import re
+from field_resolver import FieldResolver
+from metrics import timed
+
+# Cleaning text to remove newline characters
+def clean_text(text):
+    return text.replace('\n', ' ').replace('\r', '').strip()
+
+# Clean summary data
+def clean_summary_data(summary):
+    return {key: clean_text(value) if isinstance(value, str) else value for key, value in summary.items()}
+
+# Clean product data
+def clean_products_data(products):
+    return [
+        {key: clean_text(value) if isinstance(value, str) else value for key, value in product.items()}
+        for product in products
+    ]
+
+# Keyword lists per output field, highest priority first (matched case-insensitively as substrings of keys)
+LOAD_START_KEYS = [
+    "Load Start", "CARD IN", "Bay In", "IN", "start load time", "START TIME:",
+    "LOAD START TIME", "Load Start Time", "START TIME:", "Start Load Time",
+    "Load In Time", "Cargo Start Time", "Vehicle In Time", "Start Time", "Bay In Time",
+    "Load Begin Time", "Start Load Time:", "Load Time", "Loading Start Time",
+    "Loading In Time", "Truck Arrival Time"
+]
+
+# Extended list of possible keys for Card Out Time
+CARD_OUT_KEYS = [
+    "Load End", "CARD OUT", "Bay Out", "OUT", "end load time", "END TIME:",
+    "LOAD END TIME", "Load Out Time", "END TIME:", "End Load Time",
+    "Load Out Time", "Cargo End Time", "Vehicle Out Time", "End Time", "Bay Out Time",
+    "Load Finish Time", "End Load Time", "Loading End Time",
+    "Loading Out Time", "Truck Departure Time", "Bay Out", "OUT",
+    "END LOAD TIME", "END TIME:", "Load Stop:", "Load Stop Time", "TIME LOAD COMPLETE:"
+]
+
+BOL_KEYS = [
+    "shippers bol no", "DOCUMENT ", "manifest", "BILL OF LADING #", "incoming bol no",
+    "BOL NUMBER", "BOL #", "Document/BOL#", "BOL NO", "BOL REF", "BILL OF LADING NO",
+    "BILL OF LADING NO:", "BOL REF #", "BOL#", "BILL OF LADING #:", "BOL NUMBER #",
+    "BOL REFERENCE", "DOCUMENT #", "BOL NO:", "SHIPPERS BOL NO", "BILL OF LADING NUMBER",
+    "BOL #: (BILL OF LADING)", "BOL NUMBER:", "BOL ID", "BILL OF LADING IDENTIFIER",
+    "BOL-#", "BILL OF LADING REF NO", "BOL REF NO", "BOL_ID", "BILL OF LADING #:",
+    "BOL NUMBER ID", "BOL NUMBER ID:", "SHIPMENT BOL #", "BOL REFERENCE NUMBER",
+    "TRANSPORTATION BOL #", "TRUCK BOL NUMBER", "CARGO BOL #", "CONTAINER BOL #",
+    "LOADING BOL #", "ORDER BOL #", "WAYBILL #", "SHIPMENT ID", "DELIVERY BOL #",
+    "CARGO BOL ID", "INVOICE BOL #", "OF LADING #",
+]
+
+# Value fragments that mark a BOL number written inline, e.g. "Bill of Lading # 12345"
+BOL_VALUE_FRAGMENTS = ['of lading #', 'lading #']
+
+FIELD_RULES = {
+    "BOL #": BOL_KEYS,
+    "Card In time": LOAD_START_KEYS,
+    "Card Out time": CARD_OUT_KEYS,
+}
+
+# All keyword lists compiled once into a single matcher
+field_resolver = FieldResolver(FIELD_RULES)
+
+# Everything post-processing depends on besides the extraction output. Results are stored with the
+# version of the rules that produced them, so rule edits can be re-applied without calling Textract.
+def rules_snapshot():
+    return {"fields": FIELD_RULES, "bol_value_fragments": BOL_VALUE_FRAGMENTS}
+
+def rules_version(snapshot):
+    return hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+RULES_VERSION = rules_version(rules_snapshot())
+
+def _resolved_value(final_result, field, resolver=None):
+    match = (resolver or field_resolver).resolve(final_result, fields=[field])[field]
+    return match.value if match else None
+
+# Fall back to a BOL number embedded in a summary value, then keep only its digits
+def _finish_bol_number(final_result, bol_number, fragments=None):
+    if not bol_number:
+        summary_data = final_result.get("summary", {})
+        for fragment in BOL_VALUE_FRAGMENTS if fragments is None else fragments:
+            for summary_key, value in summary_data.items():
+                if isinstance(value, str) and fragment in value.lower():
+                    bol_number = re.findall(r'\d+', value)
+                    if bol_number:
+                        bol_number = bol_number[0]
+                    break
+            if bol_number:
+                break
+
+    if bol_number:
+        bol_number = re.sub(r'\D', '', bol_number)
+
+    return bol_number if bol_number else "Not Found"
+
+# Output fields no summary or product key resolves, i.e. those FORMS pairs could still decide.
+# The inline BOL fallback in summary values only applies after FORMS, so it does not count here.
+def unresolved_fields(final_result, resolver=None):
+    matches = (resolver or field_resolver).resolve(final_result)
+    return [field for field, match in matches.items() if not match]
+
+# Function to process and find Load Start Time
+@timed("process_load_start_time")
+def process_load_start_time(final_result):
+    load_start_time = _resolved_value(final_result, "Card In time")
+    return {"Card In time": load_start_time if load_start_time else "Not Found"}
+
+# Function to process and find Card Out Time
+@timed("process_card_out_time")
+def process_card_out_time(final_result):
+    card_out_time = _resolved_value(final_result, "Card Out time")
+    return {"Card Out time": card_out_time if card_out_time else "Not Found"}
+
+# Function to process and find BOL number
+@timed("process_bol_data")
+def process_bol_data(final_result):
+    return {"BOL #": _finish_bol_number(final_result, _resolved_value(final_result, "BOL #"))}
+
+# Resolve every field in one pass over the summary and product keys
+@timed("postprocess_result")
+def postprocess_result(final_result, resolver=None, bol_value_fragments=None):
+    matches = (resolver or field_resolver).resolve(final_result)
+    processed_result = {field: match.value if match else "Not Found" for field, match in matches.items()}
+    processed_result["BOL #"] = _finish_bol_number(
+        final_result, matches["BOL #"].value if matches["BOL #"] else None, bol_value_fragments
+    )
+    return processed_result
@@ -0,0 +1,126 @@
+# prefetch.py
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction import CALLS_PER_DOCUMENT
+from pipeline import process_document
+from sqlite_store import process_default
+from textract_calls import reserve_call_workers
+
+logger = logging.getLogger("TextractLogger")
+
+PREFETCH_DEPTH = int(os.environ.get("PREFETCH_DEPTH", 3))
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", 2))
+PREFETCH_MAX_BYTES = int(os.environ.get("PREFETCH_MAX_BYTES", 32 * 1024 * 1024))
+# Seconds after its last schedule() call that an owner is treated as gone (e.g. a closed browser tab)
+PREFETCH_OWNER_TTL = float(os.environ.get("PREFETCH_OWNER_TTL", 600))
+
+
+# Speculatively processes the documents a reviewer is likely to open next and keeps the results
+# in a byte-bounded LRU. Each owner (a UI session) has its own set of wanted keys: rescheduling
+# cancels that owner's queued work that is no longer wanted. Owners that stop scheduling expire
+# after owner_ttl seconds, so abandoned sessions neither pin queued work nor accumulate. Work
+# already running is left to finish and its result is kept, since the Textract calls have been paid for.
+class Prefetcher:
+    def __init__(self, process_fn=None, workers=PREFETCH_WORKERS, max_bytes=PREFETCH_MAX_BYTES, owner_ttl=PREFETCH_OWNER_TTL):
+        self.process_fn = process_fn or process_document
+        self.max_bytes = max_bytes
+        self.owner_ttl = owner_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        reserve_call_workers(workers * CALLS_PER_DOCUMENT)
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._bytes = 0
+        self._pending = {}
+        self._owners = {}
+        self._owner_seen = {}
+        self._counts = {"scheduled": 0, "completed": 0, "failed": 0, "cancelled": 0, "evicted": 0, "hits": 0, "in_flight_hits": 0, "misses": 0}
+
+    # Prefetch these (bucket, key) documents for an owner, cancelling the owner's stale requests
+    def schedule(self, documents, owner=None):
+        documents = list(documents)
+        now = time.monotonic()
+        with self._lock:
+            stale = self._owners.pop(owner, set()) - set(documents)
+            self._owner_seen.pop(owner, None)
+            for expired in [other for other, seen in self._owner_seen.items() if now - seen > self.owner_ttl]:
+                stale |= self._owners.pop(expired)
+                del self._owner_seen[expired]
+            wanted = set().union(*self._owners.values()) if self._owners else set()
+            for document in stale - wanted - set(documents):
+                future = self._pending.get(document)
+                if future is not None and future.cancel():
+                    del self._pending[document]
+                    self._counts["cancelled"] += 1
+            if documents:
+                self._owners[owner] = set(documents)
+                self._owner_seen[owner] = now
+
+            for document in documents:
+                if document in self._results or document in self._pending:
+                    continue
+                self._pending[document] = self._executor.submit(self._run, document)
+                self._counts["scheduled"] += 1
+
+    def cancel(self, owner=None):
+        self.schedule([], owner)
+
+    def _run(self, document):
+        bucket, key = document
+        try:
+            result = self.process_fn(bucket=bucket, key=key)
+        except Exception as e:
+            logger.warning(f"Prefetch of {key} failed: {e}")
+            with self._lock:
+                self._pending.pop(document, None)
+                self._counts["failed"] += 1
+            return
+
+        size = len(json.dumps(result, default=str))
+        with self._lock:
+            self._pending.pop(document, None)
+            self._counts["completed"] += 1
+            if size > self.max_bytes:
+                return
+            self._results[document] = (result, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._results.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counts["evicted"] += 1
+
+    # Finished result for a document, or None. A document still being prefetched counts as an
+    # in-flight hit: processing it now joins the running work through the pipeline's single flight.
+    def take(self, bucket, key):
+        document = (bucket, key)
+        with self._lock:
+            entry = self._results.get(document)
+            if entry is not None:
+                self._results.move_to_end(document)
+                self._counts["hits"] += 1
+                return entry[0]
+            if document in self._pending:
+                self._counts["in_flight_hits"] += 1
+            else:
+                self._counts["misses"] += 1
+            return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            lookups = stats["hits"] + stats["in_flight_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["hits"] + stats["in_flight_hits"]) / lookups if lookups else 0.0
+            stats["pending"] = len(self._pending)
+            stats["owners"] = len(self._owners)
+            stats["cached"] = len(self._results)
+            stats["cached_bytes"] = self._bytes
+            return stats
+
+
+get_default_prefetcher = process_default(Prefetcher)
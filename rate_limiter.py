@@ -0,0 +1,179 @@
+# rate_limiter.py
+
+import os
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ReadTimeoutError
+
+from metrics import registry
+
+# Starting (and maximum) calls per second per Textract API; set these to the account's quotas
+TEXTRACT_RATE_LIMITS = {
+    "analyze_expense": float(os.environ.get("TEXTRACT_TPS_ANALYZE_EXPENSE", 5)),
+    "analyze_document": float(os.environ.get("TEXTRACT_TPS_ANALYZE_DOCUMENT", 10)),
+    "detect_document_text": float(os.environ.get("TEXTRACT_TPS_DETECT_DOCUMENT_TEXT", 10)),
+}
+DEFAULT_RATE_LIMIT = float(os.environ.get("TEXTRACT_TPS_DEFAULT", 5))
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("TEXTRACT_RATE_LIMIT_RETRIES", 6))
+
+THROTTLE_CODES = {"ThrottlingException", "ProvisionedThroughputExceededException", "TooManyRequestsException"}
+TRANSIENT_CODES = {"InternalServerError", "ServiceUnavailable", "ServiceUnavailableException"}
+
+
+def is_throttle(error):
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in THROTTLE_CODES
+
+
+def is_transient(error):
+    if isinstance(error, (BotoConnectionError, ReadTimeoutError)):
+        return True
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in TRANSIENT_CODES
+
+
+# Token bucket whose refill rate is steered by AIMD: every successful call adds increase_step
+# calls/sec up to max_rate, a throttled call halves the rate (at most once per cooldown, so one
+# burst of rejections counts once) and empties the bucket. Callers block in acquire() while the
+# bucket is empty; throttled and transient failures are retried with jittered exponential backoff.
+class AdaptiveRateLimiter:
+    def __init__(self, name, max_rate, min_rate=0.2, burst=None, increase_step=0.05, decrease_factor=0.5,
+                 cooldown=1.0, max_retries=RATE_LIMIT_MAX_RETRIES, base_backoff=0.25, max_backoff=8.0):
+        self.name = name
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.burst = burst or max(1.0, max_rate)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._condition = threading.Condition()
+        self._rate = max_rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._waiting = 0
+        self._in_flight = 0
+        self._counts = {"calls": 0, "throttled": 0, "retries": 0, "failed": 0, "max_waiting": 0}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._waiting += 1
+            self._counts["max_waiting"] = max(self._counts["max_waiting"], self._waiting)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self._in_flight += 1
+                        return
+                    wait = (1 - self._tokens) / self._rate
+                    if deadline is not None:
+                        if now >= deadline:
+                            raise TimeoutError(f"{self.name}: no rate budget within {timeout:g}s")
+                        wait = min(wait, deadline - now)
+                    self._condition.wait(wait)
+            finally:
+                self._waiting -= 1
+
+    def _release(self, throttled):
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            self._refill(now)
+            if throttled:
+                self._counts["throttled"] += 1
+                if now - self._last_decrease >= self.cooldown:
+                    self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+                    self._last_decrease = now
+                self._tokens = 0.0
+            else:
+                self._rate = min(self.max_rate, self._rate + self.increase_step)
+            self._condition.notify_all()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+    # Run fn under the limiter, retrying throttled and transient failures
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            self.acquire()
+            registry.observe(f"rate_limit_wait_{self.name}", time.perf_counter() - start)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                throttled = is_throttle(e)
+                self._release(throttled)
+                if throttled:
+                    registry.inc(f"textract_throttled_{self.name}_total")
+                if (throttled or is_transient(e)) and attempt < self.max_retries:
+                    with self._condition:
+                        self._counts["retries"] += 1
+                    time.sleep(self._backoff(attempt))
+                    attempt += 1
+                    continue
+                with self._condition:
+                    self._counts["failed"] += 1
+                raise
+            self._release(False)
+            with self._condition:
+                self._counts["calls"] += 1
+            return result
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._counts)
+            stats.update({
+                "rate": round(self._rate, 3),
+                "max_rate": self.max_rate,
+                "tokens": round(self._tokens, 3),
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+            })
+            return stats
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+# One limiter per Textract API, shared by every session, job worker and batch thread in the process
+def get_limiter(api_name):
+    with _limiters_lock:
+        limiter = _limiters.get(api_name)
+        if limiter is None:
+            limiter = _limiters[api_name] = AdaptiveRateLimiter(api_name, TEXTRACT_RATE_LIMITS.get(api_name, DEFAULT_RATE_LIMIT))
+        return limiter
+
+
+# Replace the shared limiters with fresh ones allowing max_rate calls/sec for every API, or the
+# configured quotas when max_rate is None. Benchmarks use this so each run starts from a known state.
+def reset_limiters(max_rate=None):
+    with _limiters_lock:
+        _limiters.clear()
+        if max_rate is not None:
+            for api_name in TEXTRACT_RATE_LIMITS:
+                _limiters[api_name] = AdaptiveRateLimiter(api_name, max_rate)
+
+
+def limiter_stats():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+registry.gauge("textract_rate_limit_tps", "Current allowed Textract calls per second.", "api",
+               lambda: {name: stats["rate"] for name, stats in limiter_stats().items()})
+registry.gauge("textract_rate_limit_queue_depth", "Callers waiting for Textract rate budget.", "api",
+               lambda: {name: stats["queue_depth"] for name, stats in limiter_stats().items()})
@@ -0,0 +1,119 @@
+# reresolve.py
+#
+# Re-apply post-processing rules to the stored extraction output; Textract is never called:
+#   python reresolve.py                                    # apply the rules in postprocessing.py
+#   python reresolve.py --dump-rules > candidate.json      # edit the keyword lists in candidate.json
+#   python reresolve.py --rules candidate.json --dry-run   # which documents would change
+#
+# Documents are only re-resolved when one of their keys contains a keyword the edit added, removed
+# or reordered (see field_resolver.changed_keywords); all other documents keep their values.
+
+import argparse
+import csv
+import json
+import sys
+import time
+
+from field_resolver import FieldResolver, KeywordMatcher, changed_keywords
+from postprocessing import postprocess_result, rules_snapshot, rules_version
+from results_store import ResultsStore, RESULTS_STORE_PATH
+
+COMPARED_FIELDS = ["BOL #", "Card In time", "Card Out time"]
+
+
+# Documents stored under old_version whose values the new rules could change
+def affected_documents(store, old_version, old_snapshot, new_snapshot, distinct_keys):
+    if old_snapshot is None or set(old_snapshot["fields"]) != set(new_snapshot["fields"]):
+        return store.doc_ids(old_version)
+    if old_snapshot["bol_value_fragments"] != new_snapshot["bol_value_fragments"]:
+        return store.doc_ids(old_version)
+
+    changed = changed_keywords(old_snapshot["fields"], new_snapshot["fields"])
+    if not changed:
+        return set()
+    matcher = KeywordMatcher([(keyword, field) for field, keywords in changed.items() for keyword in keywords])
+    matched_keys = [key for key in distinct_keys if matcher.find_all(key.lower())]
+    return store.docs_with_keys(matched_keys, old_version)
+
+
+def reresolve(store, snapshot=None, dry_run=False):
+    start = time.perf_counter()
+    snapshot = snapshot or rules_snapshot()
+    version = rules_version(snapshot)
+    resolver = FieldResolver(snapshot["fields"])
+    distinct_keys = None
+
+    total, candidates, changes, changed_docs = 0, 0, [], set()
+    for old_version, count in store.rules_versions().items():
+        total += count
+        if old_version == version:
+            continue
+        if distinct_keys is None:
+            distinct_keys = store.distinct_keys()
+
+        doc_ids = affected_documents(store, old_version, store.rules(old_version), snapshot, distinct_keys)
+        candidates += len(doc_ids)
+        updates = []
+        for doc_id, key, final_result, old_processed in store.load(doc_ids):
+            new_processed = postprocess_result(final_result, resolver=resolver, bol_value_fragments=snapshot["bol_value_fragments"])
+            for field in COMPARED_FIELDS:
+                if old_processed.get(field) != new_processed.get(field):
+                    changes.append({"doc_id": doc_id, "key": key, "field": field, "old": old_processed.get(field), "new": new_processed.get(field)})
+                    changed_docs.add(doc_id)
+            # Results stored before versioning may predate the key index too
+            updates.append((doc_id, final_result if old_version is None else None, new_processed))
+
+        if not dry_run:
+            store.save_rules(version, snapshot)
+            store.update_processed(updates, version)
+            store.set_rules_version(old_version, version, exclude=doc_ids)
+
+    return {
+        "rules_version": version,
+        "documents": total,
+        "re_resolved": candidates,
+        "skipped": total - candidates,
+        "changed_documents": len(changed_docs),
+        "dry_run": dry_run,
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+        "changes": changes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run post-processing over stored results after a rules change")
+    parser.add_argument("--path", default=RESULTS_STORE_PATH)
+    parser.add_argument("--rules", default=None, help="rules JSON (see --dump-rules); defaults to postprocessing.py")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without updating the store")
+    parser.add_argument("--changes-csv", default=None, help="write every changed field to this CSV")
+    parser.add_argument("--show", type=int, default=20, help="changes to print")
+    parser.add_argument("--dump-rules", action="store_true", help="print the current rules as JSON and exit")
+    args = parser.parse_args(argv)
+
+    if args.dump_rules:
+        print(json.dumps(rules_snapshot(), indent=4))
+        return 0
+
+    snapshot = None
+    if args.rules:
+        with open(args.rules, 'r') as file:
+            snapshot = json.load(file)
+
+    report = reresolve(ResultsStore(args.path), snapshot, args.dry_run)
+    changes = report.pop("changes")
+    if args.changes_csv:
+        with open(args.changes_csv, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=["doc_id", "key", "field", "old", "new"])
+            writer.writeheader()
+            writer.writerows(changes)
+
+    print(json.dumps(report, indent=4))
+    for change in changes[:args.show]:
+        print(f"{change['key'] or change['doc_id']}: {change['field']} {change['old']!r} -> {change['new']!r}")
+    if len(changes) > args.show:
+        print(f"... {len(changes) - args.show} more")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+# results_store.py
+#
+# Local SQLite store of every extracted document, so lookups never go back to Textract:
+#   python results_store.py find --bol 892518
+#   python results_store.py find --since 2026-10-16 --until 2026-10-17
+#   python results_store.py export --format parquet --output bol_results.parquet
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+from sqlite_store import SQLiteStore, process_default
+
+RESULTS_STORE_PATH = os.environ.get("RESULTS_STORE_PATH", os.path.join(".textract_cache", "results.sqlite3"))
+
+# Columns returned by find() and written by export()
+EXPORT_COLUMNS = ["doc_id", "bucket", "key", "content_hash", "BOL #", "Card In time", "Card Out time", "processed_at"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    doc_id TEXT PRIMARY KEY,
+    bucket TEXT,
+    key TEXT,
+    content_hash TEXT NOT NULL,
+    bol_number TEXT,
+    card_in_time TEXT,
+    card_out_time TEXT,
+    card_in_minutes INTEGER,
+    card_out_minutes INTEGER,
+    processed_at REAL NOT NULL,
+    final TEXT NOT NULL,
+    processed TEXT NOT NULL,
+    payload TEXT,
+    rules_version TEXT
+);
+CREATE INDEX IF NOT EXISTS results_key ON results (key);
+CREATE INDEX IF NOT EXISTS results_content_hash ON results (content_hash);
+CREATE INDEX IF NOT EXISTS results_bol_number ON results (bol_number);
+CREATE INDEX IF NOT EXISTS results_processed_at ON results (processed_at);
+CREATE TABLE IF NOT EXISTS result_keys (
+    key TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    PRIMARY KEY (key, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS result_keys_doc_id ON result_keys (doc_id);
+CREATE TABLE IF NOT EXISTS resolver_rules (
+    version TEXT PRIMARY KEY,
+    rules TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# SQLite caps bound parameters per statement
+_IN_CHUNK = 500
+
+_SELECT = "SELECT doc_id, bucket, key, content_hash, bol_number, card_in_time, card_out_time, processed_at FROM results"
+
+
+# S3 documents are identified by location, uploads by their content
+def document_id(bucket, key, content_hash):
+    if bucket:
+        return f"s3://{bucket}/{key}"
+    return f"upload:{content_hash}"
+
+
+# Every string key post-processing can match on: summary, product and FORMS keys
+def document_keys(final_result):
+    sources = [final_result.get("summary", {})] + list(final_result.get("products", [])) + [final_result.get("forms", {})]
+    return {key for source in sources for key in source if isinstance(key, str)}
+
+
+def _chunks(items, size=_IN_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _row_to_record(row):
+    record = dict(zip(EXPORT_COLUMNS, row))
+    record["processed_at"] = datetime.fromtimestamp(record["processed_at"]).isoformat(timespec="seconds")
+    return record
+
+
+_TIME_PATTERN = re.compile(r"(?<!\d)(\d{1,2})\s*[:.]\s*(\d{2})(?:\s*[:.]\s*\d{2})?\s*([ap])?\.?\s*m?\.?(?![a-z])", re.IGNORECASE)
+
+
+# OCR'd clock time ("9:30", "09:30:00", "2:15 PM", "14.05") -> minutes since midnight, or None
+# when no valid time is found ("Not Found", dates, garbage). Range filters compare these, not text.
+def time_to_minutes(value):
+    match = _TIME_PATTERN.search(value) if isinstance(value, str) else None
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2)), (match.group(3) or "").lower()
+    # "13:30 PM" style readings keep their 24-hour value
+    if meridiem and 1 <= hour <= 12:
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+# A filter bound as minutes since midnight; a bound that is not a time is an error, not "match nothing"
+def _filter_minutes(value):
+    if value is None or value == "":
+        return None
+    minutes = time_to_minutes(str(value))
+    if minutes is None:
+        raise ValueError(f"Not a time of day: {value!r} (use HH:MM)")
+    return minutes
+
+
+# "2026-10-17" or a full ISO timestamp -> epoch seconds
+def _to_timestamp(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(str(value)).timestamp()
+
+
+class ResultsStore(SQLiteStore):
+    def __init__(self, path=RESULTS_STORE_PATH):
+        self._saved_versions = set()
+        super().__init__(path, _SCHEMA)
+        conn = self._connect()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(results)")]
+        # Stores created before rules were versioned
+        if "rules_version" not in columns:
+            conn.execute("ALTER TABLE results ADD COLUMN rules_version TEXT")
+        # Stores created before card times were normalized for range filters
+        if "card_in_minutes" not in columns:
+            self._add_minutes_columns(conn)
+        conn.executescript(
+            "DROP INDEX IF EXISTS results_card_in_time;"
+            "DROP INDEX IF EXISTS results_card_out_time;"
+            "CREATE INDEX IF NOT EXISTS results_rules_version ON results (rules_version);"
+            "CREATE INDEX IF NOT EXISTS results_card_in_minutes ON results (card_in_minutes);"
+            "CREATE INDEX IF NOT EXISTS results_card_out_minutes ON results (card_out_minutes);"
+        )
+
+    def _add_minutes_columns(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("ALTER TABLE results ADD COLUMN card_in_minutes INTEGER")
+            conn.execute("ALTER TABLE results ADD COLUMN card_out_minutes INTEGER")
+            rows = conn.execute("SELECT doc_id, card_in_time, card_out_time FROM results").fetchall()
+            conn.executemany(
+                "UPDATE results SET card_in_minutes = ?, card_out_minutes = ? WHERE doc_id = ?",
+                ((time_to_minutes(card_in), time_to_minutes(card_out), doc_id) for doc_id, card_in, card_out in rows),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # Insert or replace the latest result for a document, along with the keys it can match on
+    def record(self, bucket, key, content_hash, final_result, processed_result, payload=None, rules_version=None):
+        doc_id = document_id(bucket, key, content_hash)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (doc_id, bucket, key, content_hash, bol_number, card_in_time, card_out_time, "
+                "card_in_minutes, card_out_minutes, processed_at, final, processed, payload, rules_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    doc_id, bucket, key, content_hash,
+                    processed_result.get("BOL #"), processed_result.get("Card In time"), processed_result.get("Card Out time"),
+                    time_to_minutes(processed_result.get("Card In time")), time_to_minutes(processed_result.get("Card Out time")),
+                    time.time(), json.dumps(final_result, default=str), json.dumps(processed_result),
+                    json.dumps(payload or {}, default=str), rules_version,
+                ),
+            )
+            self._index_keys(conn, doc_id, final_result)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return doc_id
+
+    def _index_keys(self, conn, doc_id, final_result):
+        conn.execute("DELETE FROM result_keys WHERE doc_id = ?", (doc_id,))
+        conn.executemany("INSERT INTO result_keys (key, doc_id) VALUES (?, ?)", ((key, doc_id) for key in document_keys(final_result)))
+
+    # Keep every rules version that produced stored results, so later edits can be diffed against it
+    def save_rules(self, version, snapshot):
+        if version in self._saved_versions:
+            return
+        self._connect().execute(
+            "INSERT OR IGNORE INTO resolver_rules (version, rules, created_at) VALUES (?, ?, ?)",
+            (version, json.dumps(snapshot), time.time()),
+        )
+        self._saved_versions.add(version)
+
+    def rules(self, version):
+        row = self._connect().execute("SELECT rules FROM resolver_rules WHERE version = ?", (version,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # {rules_version: document count}; None for results stored before versioning
+    def rules_versions(self):
+        return dict(self._connect().execute("SELECT rules_version, COUNT(*) FROM results GROUP BY rules_version").fetchall())
+
+    def distinct_keys(self):
+        return [row[0] for row in self._connect().execute("SELECT DISTINCT key FROM result_keys")]
+
+    # Documents stored under a rules version that contain any of the given keys
+    def docs_with_keys(self, keys, rules_version):
+        doc_ids = set()
+        conn = self._connect()
+        for chunk in _chunks(keys):
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT DISTINCT k.doc_id FROM result_keys k JOIN results r ON r.doc_id = k.doc_id "
+                f"WHERE k.key IN ({placeholders}) AND r.rules_version IS ?",
+                chunk + [rules_version],
+            )
+            doc_ids.update(row[0] for row in rows)
+        return doc_ids
+
+    def doc_ids(self, rules_version):
+        return {row[0] for row in self._connect().execute("SELECT doc_id FROM results WHERE rules_version IS ?", (rules_version,))}
+
+    # (doc_id, key, final_result, processed_result) for the given documents
+    def load(self, doc_ids):
+        conn = self._connect()
+        for chunk in _chunks(doc_ids):
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(f"SELECT doc_id, key, final, processed FROM results WHERE doc_id IN ({placeholders})", chunk):
+                yield row[0], row[1], json.loads(row[2]), json.loads(row[3])
+
+    # Replace post-processed values in place; the raw extraction output is left untouched
+    def update_processed(self, updates, rules_version):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for doc_id, final_result, processed_result in updates:
+                conn.execute(
+                    "UPDATE results SET processed = ?, bol_number = ?, card_in_time = ?, card_out_time = ?, "
+                    "card_in_minutes = ?, card_out_minutes = ?, rules_version = ? WHERE doc_id = ?",
+                    (
+                        json.dumps(processed_result), processed_result.get("BOL #"), processed_result.get("Card In time"),
+                        processed_result.get("Card Out time"), time_to_minutes(processed_result.get("Card In time")),
+                        time_to_minutes(processed_result.get("Card Out time")), rules_version, doc_id,
+                    ),
+                )
+                if final_result is not None:
+                    self._index_keys(conn, doc_id, final_result)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # Move documents that a rules change cannot affect to the new version without touching them
+    def set_rules_version(self, old_version, new_version, exclude=()):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS excluded_docs (doc_id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM excluded_docs")
+            conn.executemany("INSERT OR IGNORE INTO excluded_docs VALUES (?)", ((doc_id,) for doc_id in exclude))
+            count = conn.execute(
+                "UPDATE results SET rules_version = ? WHERE rules_version IS ? AND doc_id NOT IN (SELECT doc_id FROM excluded_docs)",
+                (new_version, old_version),
+            ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    # Build the WHERE clause; every filter is served by one of the indexes above.
+    # bol and key match as prefixes, times as inclusive ranges on the stored "HH:MM" text,
+    # since/until bound processed_at (dates or ISO timestamps).
+    def _filter(self, bol=None, key=None, content_hash=None, since=None, until=None,
+                card_in_from=None, card_in_to=None, card_out_from=None, card_out_to=None):
+        clauses, params = [], []
+        for column, prefix in (("bol_number", bol), ("key", key)):
+            if prefix:
+                clauses.append(f"{column} >= ? AND {column} < ?")
+                params += [prefix, prefix + "\U0010ffff"]
+        if content_hash:
+            clauses.append("content_hash = ?")
+            params.append(content_hash)
+        for column, operator, value in (
+            ("processed_at", ">=", _to_timestamp(since)), ("processed_at", "<", _to_timestamp(until)),
+            ("card_in_minutes", ">=", _filter_minutes(card_in_from)), ("card_in_minutes", "<=", _filter_minutes(card_in_to)),
+            ("card_out_minutes", ">=", _filter_minutes(card_out_from)), ("card_out_minutes", "<=", _filter_minutes(card_out_to)),
+        ):
+            if value is not None and value != "":
+                clauses.append(f"{column} {operator} ?")
+                params.append(value)
+        return " AND ".join(clauses) or "1", params
+
+    def count(self, **filters):
+        where, params = self._filter(**filters)
+        return self._connect().execute(f"SELECT COUNT(*) FROM results WHERE {where}", params).fetchone()[0]
+
+    def find(self, limit=100, offset=0, **filters):
+        return list(self.iter_records(limit=limit, offset=offset, **filters))
+
+    # Newest first
+    def iter_records(self, limit=-1, offset=0, **filters):
+        where, params = self._filter(**filters)
+        cursor = self._connect().execute(
+            f"{_SELECT} WHERE {where} ORDER BY processed_at DESC LIMIT ? OFFSET ?", params + [limit, offset]
+        )
+        for row in cursor:
+            yield _row_to_record(row)
+
+    # Full stored result for one document
+    def get(self, doc_id):
+        row = self._connect().execute(
+            "SELECT final, processed, payload, content_hash FROM results WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"final": json.loads(row[0]), "processed": json.loads(row[1]), "payload": json.loads(row[2] or "{}"), "content_hash": row[3]}
+
+    def to_frame(self, **filters):
+        import pandas as pd
+        return pd.DataFrame(list(self.iter_records(**filters)), columns=EXPORT_COLUMNS)
+
+    def export_csv(self, output, **filters):
+        count = 0
+        with open(output, 'w', newline='') if isinstance(output, str) else nullcontext(output) as file:
+            writer = csv.DictWriter(file, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            for record in self.iter_records(**filters):
+                writer.writerow(record)
+                count += 1
+        return count
+
+    # Needs pyarrow (or fastparquet) installed for pandas' Parquet writer
+    def export_parquet(self, output, **filters):
+        frame = self.to_frame(**filters)
+        frame.to_parquet(output, index=False)
+        return len(frame)
+
+
+get_default_store = process_default(ResultsStore)
+
+
+def _add_filter_arguments(parser):
+    parser.add_argument("--bol", help="BOL # prefix")
+    parser.add_argument("--key", help="S3 key prefix")
+    parser.add_argument("--content-hash")
+    parser.add_argument("--since", help="processed at or after, e.g. 2026-10-16")
+    parser.add_argument("--until", help="processed before")
+    parser.add_argument("--card-in-from", help="HH:MM, compared as a time of day")
+    parser.add_argument("--card-in-to", help="HH:MM")
+    parser.add_argument("--card-out-from", help="HH:MM")
+    parser.add_argument("--card-out-to", help="HH:MM")
+
+
+def _filters_from_args(args):
+    names = ["bol", "key", "content_hash", "since", "until", "card_in_from", "card_in_to", "card_out_from", "card_out_to"]
+    return {name: getattr(args, name) for name in names}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query and export stored extraction results")
+    parser.add_argument("--path", default=RESULTS_STORE_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    find = subparsers.add_parser("find", help="print matching documents")
+    _add_filter_arguments(find)
+    find.add_argument("--limit", type=int, default=50)
+    export = subparsers.add_parser("export", help="write matching documents to CSV or Parquet")
+    _add_filter_arguments(export)
+    export.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    export.add_argument("--output", required=True)
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.path)
+    filters = _filters_from_args(args)
+    if args.command == "find":
+        for record in store.find(limit=args.limit, **filters):
+            print(json.dumps(record))
+        print(f"({store.count(**filters)} matching documents)")
+    elif args.format == "csv":
+        print(f"Wrote {store.export_csv(args.output, **filters)} rows to {args.output}")
+    else:
+        print(f"Wrote {store.export_parquet(args.output, **filters)} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
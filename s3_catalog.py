@@ -0,0 +1,220 @@
+# s3_catalog.py
+#
+# Local, indexed catalog of the documents in the S3 bucket:
+#   python s3_catalog.py sync                  # paginated ListObjectsV2 into the catalog
+#   python s3_catalog.py search 0005 --limit 20
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from sqlite_store import SQLiteStore, process_default
+
+CATALOG_PATH = os.environ.get("S3_CATALOG_PATH", os.path.join(".textract_cache", "catalog.sqlite3"))
+CATALOG_BUCKET = os.environ.get("S3_CATALOG_BUCKET", "fp-prod-s3")
+# Key list used to seed an empty catalog so the app works before the first S3 sync
+CATALOG_SEED_FILE = "s3_filenames.txt"
+LIST_PAGE_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    size INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (bucket, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_key_nocase ON documents (bucket, key COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS sync_state (
+    bucket TEXT PRIMARY KEY,
+    pass_started_at REAL,
+    resume_after TEXT,
+    completed_at REAL,
+    listed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class S3Catalog(SQLiteStore):
+    def __init__(self, path=CATALOG_PATH, bucket=CATALOG_BUCKET):
+        self.bucket = bucket
+        self._sync_lock = threading.Lock()
+        super().__init__(path, _SCHEMA)
+
+    def count(self, query=""):
+        where, params = self._filter(query)
+        return self._connect().execute(f"SELECT COUNT(*) FROM documents WHERE {where}", params).fetchone()[0]
+
+    # A query is a key prefix; "*text" searches anywhere in the key. Both ignore ASCII case, since
+    # keys are upper-case UUIDs that people type in lower case.
+    def _filter(self, query):
+        query = (query or "").strip()
+        if query.startswith("*"):
+            return "bucket = ? AND key LIKE ? ESCAPE '\\'", (self.bucket, f"%{_escape_like(query[1:])}%")
+        if query:
+            # Range scan on the case-insensitive key index
+            return "bucket = ? AND key COLLATE NOCASE >= ? AND key COLLATE NOCASE < ?", (self.bucket, query, query + "\U0010ffff")
+        return "bucket = ?", (self.bucket,)
+
+    # One page of keys in key order
+    def search(self, query="", limit=50, offset=0):
+        where, params = self._filter(query)
+        rows = self._connect().execute(
+            f"SELECT key FROM documents WHERE {where} ORDER BY key LIMIT ? OFFSET ?", params + (limit, offset)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    # Zero-based position of a key in catalog order, for jumping to its page
+    def position(self, key, query=""):
+        where, params = self._filter(query)
+        return self._connect().execute(f"SELECT COUNT(*) FROM documents WHERE {where} AND key < ?", params + (key,)).fetchone()[0]
+
+    def contains(self, key):
+        return self._connect().execute("SELECT 1 FROM documents WHERE bucket = ? AND key = ?", (self.bucket, key)).fetchone() is not None
+
+    # The next keys after `key` in catalog order
+    def following(self, key, limit):
+        rows = self._connect().execute(
+            "SELECT key FROM documents WHERE bucket = ? AND key > ? ORDER BY key LIMIT ?", (self.bucket, key, limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def import_keys(self, keys):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR IGNORE INTO documents (bucket, key, seen_at) VALUES (?, ?, ?)",
+            ((self.bucket, key, now) for key in keys),
+        )
+        conn.execute("COMMIT")
+
+    # Fill an empty catalog from the bundled key list
+    def seed_from_file(self, file_path=CATALOG_SEED_FILE):
+        if self.count() or not os.path.exists(file_path):
+            return 0
+        with open(file_path, 'r') as file:
+            keys = [line.strip() for line in file if line.strip()]
+        self.import_keys(keys)
+        return len(keys)
+
+    # Page through ListObjectsV2 and upsert each page. An interrupted pass resumes after the last
+    # key it stored; a completed pass removes keys that were not seen, i.e. deleted from the bucket.
+    def sync(self, s3, prefix="", max_pages=None):
+        with self._sync_lock:
+            conn = self._connect()
+            state = conn.execute(
+                "SELECT pass_started_at, resume_after, completed_at FROM sync_state WHERE bucket = ?", (self.bucket,)
+            ).fetchone()
+
+            if state is None or state[1] is None:
+                pass_started_at, resume_after = time.time(), None
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (bucket, pass_started_at, resume_after, completed_at, listed) "
+                    "VALUES (?, ?, NULL, ?, 0)",
+                    (self.bucket, pass_started_at, state[2] if state else None),
+                )
+            else:
+                pass_started_at, resume_after = state[0], state[1]
+
+            pages = 0
+            listed = 0
+            request = {"Bucket": self.bucket, "MaxKeys": LIST_PAGE_SIZE, "Prefix": prefix}
+            if resume_after:
+                request["StartAfter"] = resume_after
+
+            while True:
+                response = s3.list_objects_v2(**request)
+                contents = response.get("Contents", [])
+                now = time.time()
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO documents (bucket, key, size, etag, last_modified, seen_at) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (bucket, key) DO UPDATE SET size = excluded.size, etag = excluded.etag, "
+                    "last_modified = excluded.last_modified, seen_at = excluded.seen_at",
+                    [
+                        (self.bucket, item["Key"], item.get("Size"), item.get("ETag"), str(item.get("LastModified", "")), now)
+                        for item in contents
+                    ],
+                )
+                if contents:
+                    conn.execute(
+                        "UPDATE sync_state SET resume_after = ?, listed = listed + ? WHERE bucket = ?",
+                        (contents[-1]["Key"], len(contents), self.bucket),
+                    )
+                conn.execute("COMMIT")
+
+                listed += len(contents)
+                pages += 1
+                if not response.get("IsTruncated"):
+                    break
+                if max_pages is not None and pages >= max_pages:
+                    return {"listed": listed, "pages": pages, "complete": False, "removed": 0}
+                request.pop("StartAfter", None)
+                request["ContinuationToken"] = response["NextContinuationToken"]
+
+            removed = 0
+            if not prefix:
+                removed = conn.execute(
+                    "DELETE FROM documents WHERE bucket = ? AND seen_at < ?", (self.bucket, pass_started_at)
+                ).rowcount
+            conn.execute(
+                "UPDATE sync_state SET resume_after = NULL, completed_at = ? WHERE bucket = ?", (time.time(), self.bucket)
+            )
+            return {"listed": listed, "pages": pages, "complete": True, "removed": removed}
+
+    def last_synced(self):
+        row = self._connect().execute("SELECT completed_at FROM sync_state WHERE bucket = ?", (self.bucket,)).fetchone()
+        return row[0] if row else None
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _open_default_catalog():
+    catalog = S3Catalog()
+    catalog.seed_from_file()
+    return catalog
+
+
+# Process-wide catalog, seeded from s3_filenames.txt the first time it is opened
+get_default_catalog = process_default(_open_default_catalog)
+
+
+# Run a sync on a daemon thread so the UI never waits on ListObjectsV2
+def sync_in_background(catalog, s3):
+    thread = threading.Thread(target=catalog.sync, args=(s3,), name="s3-catalog-sync", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Indexed catalog of S3 document keys")
+    parser.add_argument("--bucket", default=CATALOG_BUCKET)
+    parser.add_argument("--path", default=CATALOG_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("sync", help="list the bucket into the catalog")
+    search = subparsers.add_parser("search", help="prefix search, or *text for substring search")
+    search.add_argument("query", nargs="?", default="")
+    search.add_argument("--limit", type=int, default=50)
+    search.add_argument("--offset", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    catalog = S3Catalog(args.path, args.bucket)
+    if args.command == "sync":
+        from aws_clients import get_s3_client
+        print(catalog.sync(get_s3_client()))
+    else:
+        for key in catalog.search(args.query, args.limit, args.offset):
+            print(key)
+        print(f"({catalog.count(args.query)} matching keys)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# single_flight.py
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+# Collapses identical in-flight work: the first caller for a key runs fn, every caller that
+# arrives while it is running waits for that same outcome (result or exception) instead of
+# starting a duplicate. Nothing is kept once the call finishes; caching is left to the caller.
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._executed = 0
+        self._coalesced = 0
+        self._max_waiters = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                self._max_waiters = max(self._max_waiters, call.waiters)
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            total = self._executed + self._coalesced
+            return {
+                "executed": self._executed,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls),
+                "max_waiters": self._max_waiters,
+                "coalesced_rate": self._coalesced / total if total else 0.0,
+            }
+
+
+# Process-wide instance used by the Streamlit app, so every session shares the same in-flight table
+document_flight = SingleFlight()
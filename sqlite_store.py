@@ -0,0 +1,44 @@
+# sqlite_store.py
+
+import os
+import sqlite3
+import threading
+
+
+# Base for the local SQLite stores (Textract cache, S3 catalog, job queue, results, image hashes).
+# WAL mode handles the cross-process locking; each thread gets its own connection. The schema
+# script runs once when the store is opened.
+class SQLiteStore:
+    def __init__(self, path, schema=None):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if schema:
+            self._connect().executescript(schema)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+# Getter for one instance per process, built by factory on first use, so Streamlit reruns,
+# sessions and worker threads all share it. Arguments only matter on that first call.
+def process_default(factory):
+    lock = threading.Lock()
+    instances = []
+
+    def get_default(*args, **kwargs):
+        with lock:
+            if not instances:
+                instances.append(factory(*args, **kwargs))
+            return instances[0]
+
+    return get_default
@@ -1,23 +1,25 @@
 import streamlit as st
-import boto3
-from PIL import Image
+import hashlib
 import io
 import json
-import logging
-from try2 import extract_summary_fields, extract_line_items
-from pdf2image import convert_from_bytes
-import re
-
-# Initialize logging
-logger = logging.getLogger("TextractLogger")
-logger.setLevel(logging.INFO)
-
-if not logger.handlers:
-    log_file = "textract_processing.log"
-    file_handler = logging.FileHandler(log_file)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+import uuid
+from datetime import timedelta
+from log_setup import configure_logging
+from aws_clients import get_s3_client, get_textract_client
+from textract_cache import get_default_cache
+from extraction import fetch_s3_document, is_image_key, IMAGE_CONTENT_TYPES
+from pipeline import set_default_clients
+from job_queue import get_default_queue, get_default_worker_pool, QUEUED, RUNNING, DONE, FAILED
+from results_store import document_id, get_default_store
+from prefetch import get_default_prefetcher, PREFETCH_DEPTH
+from single_flight import document_flight
+from s3_catalog import get_default_catalog, sync_in_background
+from image_prep import make_thumbnail
+from metrics import registry, span, start_metrics_server
+from rate_limiter import limiter_stats
+
+# Initialize logging (queued JSON-lines writer with rotation, configured once per process)
+logger = configure_logging()
 
 # Authentication credentials from Streamlit secrets
 USERNAME = st.secrets["USERNAME"]
@@ -26,15 +28,24 @@ PASSWORD = st.secrets["PASSWORD"]
 AWS_ACCESS_KEY_ID = st.secrets["AWS_ACCESS_KEY_ID"]
 AWS_SECRET_ACCESS_KEY = st.secrets["AWS_SECRET_ACCESS_KEY"]
 
-# Initialize AWS Textract client
+# Initialize AWS Textract client (pooled and reused for the life of the process)
 def initialize_textract_client():
-    session = boto3.Session(
+    return get_textract_client(
         aws_access_key_id=AWS_ACCESS_KEY_ID,
         aws_secret_access_key=AWS_SECRET_ACCESS_KEY
     )
-    return session.client('textract', region_name='us-east-1')
 
 textract = initialize_textract_client()
+response_cache = get_default_cache()
+start_metrics_server()
+
+# Background workers (started once per process) run the extraction pipeline; the UI only submits and polls
+S3_BUCKET = 'fp-prod-s3'
+JOB_POLL_INTERVAL = 2
+set_default_clients(textract=textract)
+job_queue = get_default_queue()
+get_default_worker_pool()
+prefetcher = get_default_prefetcher()
 
 # Streamlit UI configuration
 st.set_page_config(page_title="Document OCR with Textract", page_icon=":page_facing_up:", layout="wide")
@@ -89,242 +100,149 @@ def show_login_form():
 
     return username_input, password_input, login_button
 
-# Function to read filenames from an S3 source
-def read_s3_filenames(file_path="s3_filenames.txt"):
-    try:
-        with open(file_path, 'r') as file:
-            return [line.strip() for line in file.readlines() if line.strip()]
-    except FileNotFoundError:
-        st.error(f"Error: {file_path} not found.")
-        return []
-
-# Cleaning text to remove newline characters
-def clean_text(text):
-    return text.replace('\n', ' ').replace('\r', '').strip()
-
-# Clean summary data
-def clean_summary_data(summary):
-    return {key: clean_text(value) if isinstance(value, str) else value for key, value in summary.items()}
-
-# Clean product data
-def clean_products_data(products):
-    return [
-        {key: clean_text(value) if isinstance(value, str) else value for key, value in product.items()}
-        for product in products
-    ]
-
-# Function to process and find Load Start Time
-def process_load_start_time(final_result):
-    load_start_keys = [
-        "Load Start", "CARD IN", "Bay In", "IN", "start load time", "START TIME:", 
-        "LOAD START TIME", "Load Start Time", "START TIME:", "Start Load Time", 
-        "Load In Time", "Cargo Start Time", "Vehicle In Time", "Start Time", "Bay In Time", 
-        "Load Begin Time", "Start Load Time:", "Load Time", "Loading Start Time", 
-        "Loading In Time", "Truck Arrival Time"
-    ]
-    
-    load_start_keys_lower = [key.lower() for key in load_start_keys]
-    
-    load_start_time = None
-    summary_data = final_result.get("summary", {})
-    
-    for key in load_start_keys_lower:
-        for summary_key in summary_data.keys():
-            if key in summary_key.lower():
-                load_start_time = summary_data[summary_key]
-                break
-        if load_start_time:
-            break
-    
-    if not load_start_time:
-        products_data = final_result.get("products", [])
-        for product in products_data:
-            for key in load_start_keys_lower:
-                if any(key in k.lower() for k in product.keys()):
-                    load_start_time = product[key]
-                    break
-            if load_start_time:
-                break
-
-    processed_result = {"Card In time": load_start_time if load_start_time else "Not Found"}
-
-    return processed_result
-
-# Function to process and find Card Out Time
-def process_card_out_time(final_result):
-    # Extended list of possible keys for Card Out Time (case-insensitive matching)
-    card_out_keys = [
-        "Load End", "CARD OUT", "Bay Out", "OUT", "end load time", "END TIME:", 
-        "LOAD END TIME", "Load Out Time", "END TIME:", "End Load Time", 
-        "Load Out Time", "Cargo End Time", "Vehicle Out Time", "End Time", "Bay Out Time", 
-        "Load Finish Time", "End Load Time", "Loading End Time", 
-        "Loading Out Time", "Truck Departure Time", "Bay Out", "OUT", 
-        "END LOAD TIME", "END TIME:", "Load Stop:", "Load Stop Time", "TIME LOAD COMPLETE:"
-    ]
-    
-    # Convert all card out keys to lowercase for case-insensitive comparison
-    card_out_keys_lower = [key.lower() for key in card_out_keys]
-    
-    card_out_time = None
-    summary_data = final_result.get("summary", {})
-    
-    # Look for matching keys in the summary data
-    for key in card_out_keys_lower:
-        for summary_key in summary_data.keys():
-            if key in summary_key.lower():
-                card_out_time = summary_data[summary_key]
-                break
-        if card_out_time:
-            break
-    
-    # If no Card Out Time found in summary, check products
-    if not card_out_time:
-        products_data = final_result.get("products", [])
-        for product in products_data:
-            for key in card_out_keys_lower:
-                if any(key in k.lower() for k in product.keys()):
-                    card_out_time = product[key]
-                    break
-            if card_out_time:
-                break
-
-    processed_result = {"Card Out time": card_out_time if card_out_time else "Not Found"}
-
-    return processed_result
-
-# Function to process and find BOL number
-def process_bol_data(final_result):
-    bol_keys = [
-        "shippers bol no", "DOCUMENT ", "manifest", "BILL OF LADING #", "incoming bol no", 
-        "BOL NUMBER", "BOL #", "Document/BOL#", "BOL NO", "BOL REF", "BILL OF LADING NO", 
-        "BILL OF LADING NO:", "BOL REF #", "BOL#", "BILL OF LADING #:", "BOL NUMBER #", 
-        "BOL REFERENCE", "DOCUMENT #", "BOL NO:", "SHIPPERS BOL NO", "BILL OF LADING NUMBER", 
-        "BOL #: (BILL OF LADING)", "BOL NUMBER:", "BOL ID", "BILL OF LADING IDENTIFIER", 
-        "BOL-#", "BILL OF LADING REF NO", "BOL REF NO", "BOL_ID", "BILL OF LADING #:", 
-        "BOL NUMBER ID", "BOL NUMBER ID:", "SHIPMENT BOL #", "BOL REFERENCE NUMBER", 
-        "TRANSPORTATION BOL #", "TRUCK BOL NUMBER", "CARGO BOL #", "CONTAINER BOL #", 
-        "LOADING BOL #", "ORDER BOL #", "WAYBILL #", "SHIPMENT ID", "DELIVERY BOL #", 
-        "CARGO BOL ID", "INVOICE BOL #", "OF LADING #",
-    ]
-    
-    bol_keys_lower = [key.lower() for key in bol_keys]
-    
-    bol_number = None
-    summary_data = final_result.get("summary", {})
-    
-    for key in bol_keys_lower:
-        for summary_key in summary_data.keys():
-            if key in summary_key.lower():
-                bol_number = summary_data[summary_key]
-                break
-        if bol_number:
-            break
-    
-    if not bol_number:
-        products_data = final_result.get("products", [])
-        for product in products_data:
-            for key in bol_keys_lower:
-                if any(key in k.lower() for k in product.keys()):
-                    bol_number = product[key]
-                    break
-            if bol_number:
-                break
-    
-    if not bol_number:
-        for fragment in ['of lading #', 'lading #']:
-            for summary_key, value in summary_data.items():
-                if isinstance(value, str) and fragment in value.lower():
-                    bol_number = re.findall(r'\d+', value)
-                    if bol_number:
-                        bol_number = bol_number[0]
-                    break
-            if bol_number:
-                break
-    
-    if bol_number:
-        bol_number = re.sub(r'\D', '', bol_number)
-    
-    processed_result = {"BOL #": bol_number if bol_number else "Not Found"}
-
-    return processed_result
-
 # File upload logic
 def handle_file_upload(input_method):
     if input_method == "Upload a file":
         return st.file_uploader("Upload a Document (Image or PDF)", type=["jpg", "jpeg", "png"])
     return None
 
-# File selection from list
+# File selection from the indexed S3 catalog, one page of keys at a time
+CATALOG_PAGE_SIZE = 50
+
 def handle_file_selection(input_method):
     if input_method == "Choose from existing list":
-        filenames = read_s3_filenames()
+        catalog = get_default_catalog()
         default_file = '00052AAF-AE51-4918-A307-4C35480299F0.jpg'
-        selected_filename = st.selectbox('Select Image from list:', filenames, index=filenames.index(default_file) if default_file in filenames else 0)
-        return selected_filename
-    return None
 
-# Image processing and Textract text extraction
-def process_image_and_extract_data(bucket, key_or_file):
-    try:
-        logger.info(f"\n\nProcessing file: {key_or_file}")
-        
-        s3 = boto3.client('s3')
-        file_data, image = None, None
-
-        if isinstance(key_or_file, str):
-            obj = s3.get_object(Bucket=bucket, Key=key_or_file)
-            file_data = obj['Body'].read()
-            image = Image.open(io.BytesIO(file_data)) if key_or_file.lower().endswith(('.jpg', '.jpeg', '.png')) else None
-        else:
-            file_data = key_or_file.read()
-            image = Image.open(io.BytesIO(file_data)) if key_or_file.type in ['image/jpeg', 'image/png'] else None
+        query = st.text_input("Search keys (prefix, or *text to match anywhere)", key="catalog_query").strip()
+        total = catalog.count(query)
+        if not total:
+            st.info("No matching documents.")
+            return None
 
-        all_lines, line_items = [], []
+        page_count = (total - 1) // CATALOG_PAGE_SIZE + 1
+        default_page = 1
+        if not query and catalog.contains(default_file):
+            default_page = catalog.position(default_file) // CATALOG_PAGE_SIZE + 1
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=default_page, key=f"catalog_page_{query}")
 
-        if image:
-            response_expense = textract.analyze_expense(Document={'Bytes': file_data})
-            summary_data = extract_summary_fields(response_expense, logger)
-            line_items = extract_line_items(response_expense, logger)
-
-            response_doc = textract.analyze_document(Document={'Bytes': file_data}, FeatureTypes=['TABLES', 'FORMS'])
-            all_lines = [block['Text'] for block in response_doc['Blocks'] if block['BlockType'] == 'LINE']
-
-        else:
-            images = convert_from_bytes(file_data)
-            for img in images:
-                img_bytes = io.BytesIO()
-                img.save(img_bytes, format='PNG')
-                img_bytes.seek(0)
-
-                response_doc = textract.analyze_document(Document={'Bytes': img_bytes.read()}, FeatureTypes=['TABLES', 'FORMS'])
-                all_lines.extend([block['Text'] for block in response_doc['Blocks'] if block['BlockType'] == 'LINE'])
-
-            summary_data = {'lines': all_lines}
-            line_items = []
-
-        final_result = {'summary': summary_data, 'products': line_items}
-        final_result['summary'] = clean_summary_data(final_result['summary'])
-        final_result['products'] = clean_products_data(final_result['products'])
-
-        json_output = json.dumps(final_result, indent=4)
-        logger.info(f"Extracted JSON: {json_output}")
+        filenames = catalog.search(query, limit=CATALOG_PAGE_SIZE, offset=(page - 1) * CATALOG_PAGE_SIZE)
+        selected_filename = st.selectbox('Select Image from list:', filenames, index=filenames.index(default_file) if default_file in filenames else 0)
+        st.caption(f"{total} matching documents")
 
-        processed_bol_result = process_bol_data(final_result)
-        processed_load_start_result = process_load_start_time(final_result)
-        processed_card_out_result = process_card_out_time(final_result)
+        if st.button(f"Process all {len(filenames)} documents on this page"):
+            st.session_state.batch_jobs = job_queue.submit_many(S3_BUCKET, filenames)
 
-        processed_result = {**processed_bol_result, **processed_load_start_result, **processed_card_out_result}
+        if st.button("Refresh list from S3"):
+            sync_in_background(catalog, get_s3_client())
+            st.toast("Catalog sync started in the background.")
+        return selected_filename
+    return None
 
-        return image, final_result, processed_result
+# Raw S3 bytes for previews; Textract processing itself runs on the job workers
+@st.cache_data(max_entries=32, show_spinner=False)
+def fetch_preview_bytes(bucket, key):
+    return fetch_s3_document(get_s3_client(), bucket, key)
+
+# Submit a document to the background queue once per session; identical documents share a job
+def submit_job(source_id, **document):
+    jobs = st.session_state.setdefault("jobs", {})
+    if source_id not in jobs:
+        logger.info(f"Queueing file: {source_id}")
+        jobs[source_id] = job_queue.submit(**document)
+    return jobs[source_id]
+
+def prefetch_owner():
+    return st.session_state.setdefault("prefetch_owner", uuid.uuid4().hex)
+
+# A prefetched result is looked up once per session and document, so reruns do not inflate the hit rate
+def take_prefetched(bucket, key):
+    taken = st.session_state.setdefault("prefetched", {})
+    if key not in taken:
+        if len(taken) >= PREFETCH_DEPTH * 4:
+            taken.clear()
+        taken[key] = prefetcher.take(bucket, key)
+    return taken[key]
+
+# Polls a pending job without rerunning the whole page; a finished job triggers one full rerun to show it
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def job_progress(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job["status"] in (DONE, FAILED):
+        st.rerun()
+    if job["status"] == QUEUED:
+        st.info(f"Queued, {job_queue.position(job_id)} documents ahead. You can leave this page; the job keeps running.")
+    else:
+        st.info(f"Processing (attempt {job['attempts']})...")
+
+# Processed fields of a finished document. The results store is preferred over the copy kept with the
+# job or prefetch, since reresolve.py updates it in place after rule changes.
+def stored_processed(bucket, key, content_hash, processed):
+    stored = get_default_store().get(document_id(bucket, key, content_hash))
+    if stored is not None:
+        return stored["processed"]
+    return processed
+
+def job_processed(job):
+    return stored_processed(job["bucket"], job["key"], job["content_hash"], (job["result"] or {}).get("processed") or {})
+
+# Status or results of one job
+def display_job(job_id, image_loader):
+    job = job_queue.get(job_id)
+    if job is None:
+        st.error("Job not found.")
+        return
+    if job["status"] in (QUEUED, RUNNING):
+        job_progress(job_id)
+        return
+    if job["status"] == FAILED:
+        st.error(f"Error: {job['error']}")
+        if st.button("Retry", key=f"retry_{job_id}"):
+            if job_queue.retry(job_id):
+                st.rerun()
+            st.warning("This job can no longer be retried; upload the document again.")
+        return
+
+    display_finished(job["result"]["final"], job_processed(job), image_loader)
+
+# Results with an optional image preview; a failed preview never hides the extracted data
+def display_finished(final_result, processed_result, image_loader):
+    if 'dedup' in final_result:
+        st.info(f"Near-duplicate of {final_result['dedup']['of']} (distance {final_result['dedup']['distance']}); stored result reused without Textract.")
+    if 'errors' in final_result:
+        st.warning(f"Partial result, failed calls: {', '.join(final_result['errors'])}")
+    try:
+        image_data = image_loader()
     except Exception as e:
-        logger.error(f"Processing failed: {e}")
-        st.error(f"Error: {e}")
-        return None, {}, {}
+        logger.exception(f"Preview failed: {e}")
+        image_data = None
+    display_results(image_data, final_result, processed_result)
+
+# Progress of documents queued together
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def display_batch_progress(job_ids):
+    jobs = job_queue.get_many(job_ids)
+    finished = sum(job["status"] in (DONE, FAILED) for job in jobs)
+    st.progress(finished / len(jobs) if jobs else 1.0, text=f"Batch: {finished} of {len(jobs)} finished")
+    rows = [
+        {"key": job["key"], "status": job["status"], **(job_processed(job) if job["status"] == DONE else {}), "error": job["error"]}
+        for job in jobs
+    ]
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+
+# Size-bounded preview, cached per document across reruns and sessions
+@st.cache_data(max_entries=128, show_spinner=False)
+def cached_thumbnail(digest, _image_data):
+    with span("thumbnail_decode", len(_image_data)):
+        return make_thumbnail(_image_data)
 
 # Displaying results
-def display_results(img, final_result, processed_result):
-    if img:
-        st.image(img, caption="Uploaded Document", use_container_width=True)
+def display_results(image_data, final_result, processed_result):
+    if image_data:
+        digest = hashlib.sha256(image_data).hexdigest()
+        st.image(cached_thumbnail(digest, image_data), caption="Uploaded Document", use_container_width=True)
+        if st.toggle("Show full resolution", key=f"full_view_{digest}"):
+            st.image(image_data, caption="Uploaded Document (full resolution)", use_container_width=True)
     
     st.subheader("Structured JSON with Summary and Line Items (Products)")
     st.code(json.dumps(final_result, indent=4), language="json")
@@ -332,6 +250,83 @@ def display_results(img, final_result, processed_result):
     st.subheader("Post Processed Result")
     st.code(json.dumps(processed_result, indent=4), language="json")
 
+# Admin panel with per-stage latency and a Prometheus export
+def display_metrics_panel():
+    with st.expander("Admin: processing metrics"):
+        rows = registry.summary()
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.write("No documents processed yet.")
+        limits = limiter_stats()
+        if limits:
+            st.caption("Textract rate limits (calls/sec, waiting callers)")
+            st.dataframe([{"api": api, **stats} for api, stats in limits.items()], hide_index=True, use_container_width=True)
+        st.download_button("Download Prometheus metrics", registry.render_prometheus(), file_name="bol_ocr_metrics.prom", mime="text/plain")
+
+# Query page over the local results store; nothing here calls Textract
+RESULTS_PAGE_SIZE = 200
+
+def display_results_search():
+    store = get_default_store()
+    st.subheader("Search extracted results")
+
+    col1, col2, col3 = st.columns(3)
+    bol = col1.text_input("BOL # (prefix)").strip()
+    key = col2.text_input("S3 key (prefix)").strip()
+    processed = col3.date_input("Processed between", value=(), key="results_dates")
+    col4, col5, col6, col7 = st.columns(4)
+    filters = {
+        "bol": bol, "key": key,
+        "card_in_from": col4.text_input("Card In from (HH:MM)").strip(),
+        "card_in_to": col5.text_input("Card In to (HH:MM)").strip(),
+        "card_out_from": col6.text_input("Card Out from (HH:MM)").strip(),
+        "card_out_to": col7.text_input("Card Out to (HH:MM)").strip(),
+    }
+    if len(processed) == 2:
+        filters["since"] = processed[0].isoformat()
+        filters["until"] = (processed[1] + timedelta(days=1)).isoformat()
+
+    try:
+        total = store.count(**filters)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    records = store.find(limit=RESULTS_PAGE_SIZE, **filters)
+    st.caption(f"{total} matching documents" + (f", showing the newest {RESULTS_PAGE_SIZE}" if total > RESULTS_PAGE_SIZE else ""))
+    if not records:
+        return
+    st.dataframe(records, hide_index=True, use_container_width=True)
+
+    # Exports cover every matching row, so they are only built on request and kept for these filters
+    export_filters = json.dumps(filters, sort_keys=True)
+    if st.button(f"Prepare export of {total} documents"):
+        with st.spinner("Building export..."):
+            csv_buffer = io.StringIO()
+            store.export_csv(csv_buffer, **filters)
+            parquet_data = None
+            try:
+                parquet_buffer = io.BytesIO()
+                store.export_parquet(parquet_buffer, **filters)
+                parquet_data = parquet_buffer.getvalue()
+            except ImportError:
+                pass
+        st.session_state.results_export = (export_filters, csv_buffer.getvalue(), parquet_data)
+
+    export = st.session_state.get("results_export")
+    if export and export[0] == export_filters:
+        col1, col2 = st.columns(2)
+        col1.download_button("Export CSV", export[1], file_name="bol_results.csv", mime="text/csv")
+        if export[2] is not None:
+            col2.download_button("Export Parquet", export[2], file_name="bol_results.parquet", mime="application/octet-stream")
+        else:
+            col2.caption("Install pyarrow for Parquet export.")
+
+    doc_id = st.selectbox("Show stored result", [record["doc_id"] for record in records])
+    stored = store.get(doc_id)
+    if stored:
+        st.code(json.dumps(stored, indent=4), language="json")
+
 # Main OCR content and processing flow
 def display_ocr_content():
     input_method = st.sidebar.radio("Choose Input Method", ("Upload a file", "Choose from existing list"), index=1)
@@ -346,17 +341,45 @@ def display_ocr_content():
         uploaded_file = handle_file_upload(input_method)
         selected_filename = handle_file_selection(input_method)
 
-    s3_bucket = 'fp-prod-s3'
+        cache_stats = response_cache.stats()
+        st.caption(f"Textract cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries")
+        flight_stats = document_flight.stats()
+        st.caption(f"Coalesced requests: {flight_stats['coalesced']} of {flight_stats['executed'] + flight_stats['coalesced']}")
+        counters = registry.counters()
+        if "second_calls_avoided_total" in counters or "second_calls_made_total" in counters:
+            avoided = counters.get("second_calls_avoided_total", 0)
+            st.caption(f"Second Textract calls avoided: {avoided} of {avoided + counters.get('second_calls_made_total', 0)}")
+        if counters.get("dedup_hits_total"):
+            st.caption(f"Near-duplicate reuses: {counters['dedup_hits_total']}")
+        prefetch_stats = prefetcher.stats()
+        st.caption(f"Prefetch: {prefetch_stats['hit_rate']:.0%} hit rate, {prefetch_stats['pending']} pending, {prefetch_stats['cached']} ready")
+        queue_counts = job_queue.counts()
+        st.caption(f"Jobs: {queue_counts[QUEUED]} queued, {queue_counts[RUNNING]} running, {queue_counts[DONE]} done, {queue_counts[FAILED]} failed")
+        display_metrics_panel()
+
+    if st.session_state.get("batch_jobs"):
+        display_batch_progress(st.session_state.batch_jobs)
 
     if uploaded_file:
-        with st.spinner("Processing the document, please wait..."):
-            img, final_result, processed_result = process_image_and_extract_data(s3_bucket, uploaded_file)
-            display_results(img, final_result, processed_result)
+        file_data = uploaded_file.getvalue()
+        is_image = uploaded_file.type in IMAGE_CONTENT_TYPES
+        job_id = submit_job(
+            ('upload', hashlib.sha256(file_data).hexdigest()), file_data=file_data, is_image=is_image, key=uploaded_file.name
+        )
+        display_job(job_id, lambda: file_data if is_image else None)
 
     elif selected_filename:
-        with st.spinner("Processing, please wait..."):
-            img, final_result, processed_result = process_image_and_extract_data(s3_bucket, selected_filename)
-            display_results(img, final_result, processed_result)
+        image_loader = lambda: fetch_preview_bytes(S3_BUCKET, selected_filename) if is_image_key(selected_filename) else None
+        prefetched = take_prefetched(S3_BUCKET, selected_filename)
+        if prefetched:
+            display_finished(prefetched[0], stored_processed(S3_BUCKET, selected_filename, None, prefetched[1]), image_loader)
+        else:
+            job_id = submit_job(('s3', S3_BUCKET, selected_filename), bucket=S3_BUCKET, key=selected_filename)
+            display_job(job_id, image_loader)
+
+        # Work ahead on the documents a reviewer stepping through the list opens next
+        next_keys = get_default_catalog().following(selected_filename, PREFETCH_DEPTH)
+        prefetcher.schedule([(S3_BUCKET, key) for key in next_keys], owner=prefetch_owner())
 
     else:
         st.write("Please select or upload an image or PDF to process.")
@@ -374,5 +397,7 @@ if __name__ == "__main__":
                 st.session_state.authenticated = True
             else:
                 st.error("Invalid credentials! Please try again.")
+    elif st.sidebar.radio("Page", ("Process documents", "Search results")) == "Search results":
+        display_results_search()
     else:
         display_ocr_content()
@@ -0,0 +1,127 @@
+# textract_cache.py
+
+import hashlib
+import json
+import os
+import time
+
+from sqlite_store import SQLiteStore, process_default
+
+# Cache location and limits, overridable per host through the environment
+DEFAULT_CACHE_PATH = os.environ.get("TEXTRACT_CACHE_PATH", os.path.join(".textract_cache", "responses.sqlite3"))
+DEFAULT_MAX_BYTES = int(os.environ.get("TEXTRACT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+DEFAULT_MAX_AGE_SECONDS = int(os.environ.get("TEXTRACT_CACHE_MAX_AGE_SECONDS", 30 * 24 * 3600))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    api_name TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+
+# Hash of the document bytes combined with the API name and sorted FeatureTypes, plus an optional
+# variant naming the transformation applied to those bytes before sending them
+def make_cache_key(file_data, api_name, feature_types=None, variant=None):
+    digest = hashlib.sha256(file_data).hexdigest()
+    features = ",".join(sorted(feature_types or []))
+    cache_key = f"{api_name}:{features}:{digest}"
+    return f"{cache_key}:{variant}" if variant else cache_key
+
+
+# On-disk Textract response cache shared by every session and process on the host
+class TextractCache(SQLiteStore):
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        super().__init__(path, _SCHEMA)
+
+    def _bump(self, conn, name, amount=1):
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+
+    # Return the stored response for a key, or None on a miss or an expired entry
+    def get(self, cache_key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT response, created_at FROM responses WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+
+        if row is None or now - row[1] > self.max_age_seconds:
+            self._bump(conn, "misses")
+            return None
+
+        conn.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (now, cache_key))
+        self._bump(conn, "hits")
+        return json.loads(row[0])
+
+    def put(self, cache_key, api_name, response):
+        payload = json.dumps(response, default=str)
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (cache_key, api_name, response, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (cache_key, api_name, payload, len(payload), now, now),
+        )
+        self.evict()
+
+    # Drop expired entries, then least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        conn = self._connect()
+        removed = conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+        ).rowcount
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            stale_keys = []
+            for cache_key, size in conn.execute("SELECT cache_key, size FROM responses ORDER BY last_access"):
+                stale_keys.append((cache_key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM responses WHERE cache_key = ?", stale_keys)
+            removed += len(stale_keys)
+
+        if removed:
+            self._bump(conn, "evictions", removed)
+        return removed
+
+    # Call a Textract API through the cache; kwargs are passed on to the API unchanged.
+    # With key_data the entry is keyed on key_data and variant instead of file_data, which may then
+    # be a callable producing the bytes to send; it only runs on a miss.
+    def call(self, api_name, api_fn, file_data, key_data=None, variant=None, **kwargs):
+        cache_key = make_cache_key(file_data if key_data is None else key_data, api_name, kwargs.get("FeatureTypes"), variant)
+        response = self.get(cache_key)
+        if response is None:
+            response = api_fn(Document={'Bytes': file_data() if callable(file_data) else file_data}, **kwargs)
+            self.put(cache_key, api_name, response)
+        return response
+
+    def stats(self):
+        conn = self._connect()
+        stats = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        stats.update({"entries": entries, "bytes": total})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        self._connect().execute("DELETE FROM responses")
+
+
+# Process-wide cache instance, so Streamlit reruns do not reopen the database
+get_default_cache = process_default(TextractCache)
@@ -0,0 +1,107 @@
+# textract_calls.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Upper bound in seconds for a single Textract call, counted from when the call starts running;
+# time spent queued behind other calls does not count
+TEXTRACT_CALL_TIMEOUT = float(os.environ.get("TEXTRACT_CALL_TIMEOUT", 60))
+# Threads in the shared call pool before any caller reserves more
+TEXTRACT_CALL_WORKERS = int(os.environ.get("TEXTRACT_CALL_WORKERS", 8))
+
+# One pool per process, shared by every session, so reruns do not spawn new threads. Callers that
+# run many documents at once (job workers, prefetch, batch) reserve threads for their calls, and
+# the pool is replaced by a larger one when the reservations outgrow it.
+_executor = ThreadPoolExecutor(max_workers=TEXTRACT_CALL_WORKERS, thread_name_prefix="textract-call")
+_executor_lock = threading.Lock()
+_reserved = [0]
+
+
+def _resize(size):
+    global _executor
+    if size > _executor._max_workers:
+        previous = _executor
+        _executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="textract-call")
+        # Calls already queued on the old pool still run; its threads exit once it drains
+        previous.shutdown(wait=False)
+
+
+# Make room for count more concurrent calls; pair with release_call_workers when the caller is done
+def reserve_call_workers(count):
+    with _executor_lock:
+        _reserved[0] += count
+        _resize(max(TEXTRACT_CALL_WORKERS, _reserved[0]))
+
+
+# The pool is not shrunk: idle threads cost little and the next reservation reuses them
+def release_call_workers(count):
+    with _executor_lock:
+        _reserved[0] = max(0, _reserved[0] - count)
+
+
+def call_pool_size():
+    with _executor_lock:
+        return _executor._max_workers
+
+
+# Outcome of one call: either a result or the error that replaced it
+class CallResult:
+    def __init__(self, name, result=None, error=None, elapsed=0.0):
+        self.name = name
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+# Queue a single call on the shared pool, for callers that manage their own in-flight window.
+# future.timing records when the call started running and how long it ran, for result_within.
+def submit(fn, *args, **kwargs):
+    timing = {"started": threading.Event()}
+
+    def run():
+        timing["started_at"] = time.monotonic()
+        timing["started"].set()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timing["elapsed"] = time.monotonic() - timing["started_at"]
+
+    with _executor_lock:
+        future = _executor.submit(run)
+    future.timing = timing
+    return future
+
+
+# Result of a submitted call, allowing it timeout seconds from when it started running.
+# Raises concurrent.futures.TimeoutError when the call runs longer.
+def result_within(future, timeout=TEXTRACT_CALL_TIMEOUT):
+    timing = future.timing
+    while not timing["started"].wait(0.1):
+        if future.done():
+            return future.result()
+    return future.result(timeout=max(0.0, timing["started_at"] + timeout - time.monotonic()))
+
+
+# Run independent zero-argument callables in parallel and join them.
+# Each call gets its own timeout and error slot, so one failure never hides the other results.
+def run_concurrently(calls, timeout=TEXTRACT_CALL_TIMEOUT):
+    futures = {name: submit(fn) for name, fn in calls.items()}
+    results = {}
+
+    for name, future in futures.items():
+        try:
+            result = result_within(future, timeout)
+            results[name] = CallResult(name, result=result, elapsed=future.timing["elapsed"])
+        except FutureTimeoutError:
+            future.cancel()
+            results[name] = CallResult(name, error=TimeoutError(f"{name} timed out after {timeout:g}s"), elapsed=timeout)
+        except Exception as e:
+            results[name] = CallResult(name, error=e)
+
+    return results
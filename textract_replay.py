@@ -0,0 +1,269 @@
+# textract_replay.py
+#
+# Record real Textract responses once, then replay them offline:
+#   python textract_replay.py record --keys s3_filenames.txt --limit 50 --fixtures fixtures
+#   python textract_replay.py synthetic --count 200 --fixtures fixtures
+#
+# Fixture layout:
+#   fixtures/documents/<key>                      raw document bytes as stored in S3
+#   fixtures/responses/<api_name>/<digest>.json   response for the exact bytes sent to Textract
+
+import argparse
+import collections
+import hashlib
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from textract_cache import make_cache_key
+
+REPLAY_APIS = ('analyze_expense', 'analyze_document', 'detect_document_text')
+
+
+def _document_path(fixtures_dir, key):
+    return os.path.join(fixtures_dir, "documents", key.replace("/", "__"))
+
+
+def _response_path(fixtures_dir, api_name, file_data, feature_types=None):
+    digest = hashlib.sha256(make_cache_key(file_data, api_name, feature_types).encode()).hexdigest()
+    return os.path.join(fixtures_dir, "responses", api_name, f"{digest}.json")
+
+
+def _write_json(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(payload, file, default=str)
+
+
+# Forwards calls to a real Textract client and saves every response as a fixture
+class RecordingTextractClient:
+    def __init__(self, client, fixtures_dir):
+        self._client = client
+        self.fixtures_dir = fixtures_dir
+
+    def _record(self, api_name, Document, **kwargs):
+        response = getattr(self._client, api_name)(Document=Document, **kwargs)
+        response.pop("ResponseMetadata", None)
+        _write_json(_response_path(self.fixtures_dir, api_name, Document['Bytes'], kwargs.get("FeatureTypes")), response)
+        return response
+
+    def analyze_expense(self, Document, **kwargs):
+        return self._record('analyze_expense', Document, **kwargs)
+
+    def analyze_document(self, Document, **kwargs):
+        return self._record('analyze_document', Document, **kwargs)
+
+    def detect_document_text(self, Document, **kwargs):
+        return self._record('detect_document_text', Document, **kwargs)
+
+
+# Local stand-in for the Textract client. Responses are looked up by the bytes sent; when no exact
+# fixture exists (strict=False) recorded responses of the same API are handed out round-robin.
+# latency/jitter add a simulated round trip, throttle_rate raises ThrottlingException at random and
+# quota_tps throttles calls beyond that many per API in any one-second window, like the real service.
+class ReplayTextractClient:
+    def __init__(self, fixtures_dir, latency=0.0, jitter=0.0, throttle_rate=0.0, strict=False, seed=None, quota_tps=None):
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.quota_tps = quota_tps
+        self._recent = {api_name: collections.deque() for api_name in REPLAY_APIS}
+        self.strict = strict
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._fallbacks = {}
+        self.calls = {api_name: 0 for api_name in REPLAY_APIS}
+        self.throttled = 0
+
+    def _fallback(self, api_name):
+        with self._lock:
+            if api_name not in self._fallbacks:
+                directory = os.path.join(self.fixtures_dir, "responses", api_name)
+                names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+                if not names:
+                    raise KeyError(f"no recorded {api_name} fixtures in {self.fixtures_dir}")
+                self._fallbacks[api_name] = itertools.cycle([os.path.join(directory, name) for name in names])
+            return next(self._fallbacks[api_name])
+
+    def _replay(self, api_name, Document, **kwargs):
+        with self._lock:
+            self.calls[api_name] += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            throttled = self._random.random() < self.throttle_rate
+            if self.quota_tps:
+                now = time.monotonic()
+                recent = self._recent[api_name]
+                while recent and now - recent[0] >= 1.0:
+                    recent.popleft()
+                if len(recent) >= self.quota_tps:
+                    throttled = True
+                else:
+                    recent.append(now)
+            if throttled:
+                self.throttled += 1
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, api_name)
+
+        path = _response_path(self.fixtures_dir, api_name, Document['Bytes'], kwargs.get("FeatureTypes"))
+        if not os.path.exists(path):
+            if self.strict:
+                raise KeyError(f"no {api_name} fixture for this document")
+            path = self._fallback(api_name)
+        with open(path, 'r') as file:
+            return json.load(file)
+
+    def analyze_expense(self, Document, **kwargs):
+        return self._replay('analyze_expense', Document, **kwargs)
+
+    def analyze_document(self, Document, **kwargs):
+        return self._replay('analyze_document', Document, **kwargs)
+
+    def detect_document_text(self, Document, **kwargs):
+        return self._replay('detect_document_text', Document, **kwargs)
+
+
+# Local stand-in for the S3 client, serving documents from the fixtures directory
+class ReplayS3Client:
+    def __init__(self, fixtures_dir, latency=0.0):
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+
+    def get_object(self, Bucket, Key):
+        if self.latency:
+            time.sleep(self.latency)
+        with open(_document_path(self.fixtures_dir, Key), 'rb') as file:
+            return {'Body': io.BytesIO(file.read())}
+
+    def keys(self):
+        directory = os.path.join(self.fixtures_dir, "documents")
+        return sorted(name.replace("__", "/") for name in os.listdir(directory)) if os.path.isdir(directory) else []
+
+    # Paginated listing with the same request/response shape as ListObjectsV2
+    def list_objects_v2(self, Bucket, MaxKeys=1000, Prefix="", StartAfter="", ContinuationToken=None):
+        after = ContinuationToken or StartAfter
+        keys = [key for key in self.keys() if key.startswith(Prefix) and key > after]
+        page = keys[:MaxKeys]
+        response = {
+            "Contents": [
+                {"Key": key, "Size": os.path.getsize(_document_path(self.fixtures_dir, key)), "ETag": '""'}
+                for key in page
+            ],
+            "KeyCount": len(page),
+            "IsTruncated": len(keys) > MaxKeys,
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+
+# Fetch documents from S3 and run the normal pipeline through a recording client
+def record_fixtures(keys, bucket, fixtures_dir, s3=None, textract=None):
+    from aws_clients import get_s3_client, get_textract_client
+    from extraction import extract_document, fetch_s3_document, is_image_key
+
+    s3 = s3 or get_s3_client()
+    recorder = RecordingTextractClient(textract or get_textract_client(), fixtures_dir)
+    recorded = 0
+    for key in keys:
+        file_data = fetch_s3_document(s3, bucket, key)
+        path = _document_path(fixtures_dir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(file_data)
+        extract_document(recorder, file_data, is_image_key(key), cache=None)
+        recorded += 1
+    return recorded
+
+
+def _synthetic_expense(rng, index):
+    def field(label, value):
+        return {"LabelDetection": {"Text": label}, "Type": {"Text": "OTHER"}, "ValueDetection": {"Text": value}}
+
+    labels = ["VENDOR", "ADDRESS", "TOTAL", "DATE", "CARRIER", "TRAILER #", "DRIVER", "PRODUCT", "GROSS GALLONS", "NET GALLONS"]
+    fields = [field(label, f"{label.lower()} {rng.randint(1, 9999)}") for label in rng.sample(labels, 7)]
+    fields.insert(rng.randint(0, len(fields)), field(rng.choice(["BOL #", "BILL OF LADING NO:", "Document/BOL#", "SHIPMENT ID"]), f"{rng.randint(100000, 999999)}"))
+    fields.insert(rng.randint(0, len(fields)), field(rng.choice(["CARD IN", "Load Start Time", "Bay In"]), f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"))
+    fields.insert(rng.randint(0, len(fields)), field(rng.choice(["CARD OUT", "Load End", "TIME LOAD COMPLETE:"]), f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"))
+    items = [
+        {"LineItemExpenseFields": [
+            {"Type": {"Text": "ITEM"}, "ValueDetection": {"Text": rng.choice(["ULSD", "UNL 87", "PREM 93"])}},
+            {"Type": {"Text": "QUANTITY"}, "ValueDetection": {"Text": str(rng.randint(1000, 9000))}},
+        ]}
+        for _ in range(rng.randint(1, 4))
+    ]
+    return {"ExpenseDocuments": [{"ExpenseIndex": index, "SummaryFields": fields, "LineItemGroups": [{"LineItems": items}]}]}
+
+
+def _synthetic_document(lines):
+    blocks = [{"BlockType": "PAGE", "Id": "page", "Relationships": [{"Type": "CHILD", "Ids": [f"line-{i}" for i in range(len(lines))]}]}]
+    blocks += [{"BlockType": "LINE", "Id": f"line-{i}", "Text": text} for i, text in enumerate(lines)]
+    return {"Blocks": blocks}
+
+
+# Generate small placeholder documents with plausible responses, for benchmarks without any recordings
+def synthetic_fixtures(fixtures_dir, count, seed=0):
+    from PIL import Image, ImageDraw
+    from image_prep import prepare_image_bytes
+
+    rng = random.Random(seed)
+    keys = []
+    for index in range(count):
+        key = f"SYNTHETIC-{index:05d}.jpg"
+        image = Image.new('L', (850, 1100), 255)
+        ImageDraw.Draw(image).text((40, 40), f"BILL OF LADING {key}", fill=0)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+        file_data = buffer.getvalue()
+
+        path = _document_path(fixtures_dir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(file_data)
+
+        expense = _synthetic_expense(rng, index)
+        lines = [f"{field['LabelDetection']['Text']} {field['ValueDetection']['Text']}" for field in expense["ExpenseDocuments"][0]["SummaryFields"]]
+        sent, _ = prepare_image_bytes(file_data)
+        _write_json(_response_path(fixtures_dir, 'analyze_expense', sent), expense)
+        _write_json(_response_path(fixtures_dir, 'analyze_document', sent, ['TABLES', 'FORMS']), _synthetic_document(lines))
+        _write_json(_response_path(fixtures_dir, 'detect_document_text', sent), _synthetic_document(lines))
+        keys.append(key)
+    return keys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or generate Textract fixtures for offline replay")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record = subparsers.add_parser("record", help="call the real APIs and save their responses")
+    record.add_argument("--keys", default="s3_filenames.txt")
+    record.add_argument("--bucket", default="fp-prod-s3")
+    record.add_argument("--limit", type=int, default=20)
+    record.add_argument("--fixtures", default="fixtures")
+
+    synthetic = subparsers.add_parser("synthetic", help="write generated fixtures without calling AWS")
+    synthetic.add_argument("--count", type=int, default=100)
+    synthetic.add_argument("--fixtures", default="fixtures")
+    synthetic.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        from batch_extract import read_keys
+        count = record_fixtures(read_keys(args.keys)[:args.limit], args.bucket, args.fixtures)
+    else:
+        count = len(synthetic_fixtures(args.fixtures, args.count, seed=args.seed))
+    print(f"Wrote fixtures for {count} documents to {args.fixtures}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
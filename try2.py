@@ -1,12 +1,10 @@
 
 # try2.py
 
-import boto3
 import logging
+from metrics import timed
 
-# Set up Textract client
-textract = boto3.client('textract', region_name='us-east-1')
-
+@timed("extract_summary_fields")
 def extract_summary_fields(response, logger):
     summary_fields = response.get('ExpenseDocuments', [])[0].get('SummaryFields', [])
     extracted_data = {}
@@ -23,6 +21,7 @@ def extract_summary_fields(response, logger):
     logger.info(f"Extracted {len(extracted_data)} summary fields.")
     return extracted_data
 
+@timed("extract_line_items")
 def extract_line_items(response, logger):
     line_item_groups = response.get('ExpenseDocuments', [])[0].get('LineItemGroups', [])
     products = []